@@ -0,0 +1,61 @@
+"""
+Measures character set detection latency by sample size and encoding, comparing the tiered
+detector in _detect_encoding with a full chardet.detect over the same sample.
+
+    python3 -m benchmarks.bench_decode
+"""
+import timeit
+
+import chardet
+
+from toolforgeio.io import ENCODING_SAMPLE_SIZE, _detect_encoding
+
+SIZES = [1024, 16 * 1024, ENCODING_SAMPLE_SIZE]
+
+ENCODINGS = ["ascii", "utf-8", "latin-1", "windows-1251", "shift_jis", "utf-16-le"]
+
+ROWS = {
+    "ascii": "{0},Springfield,IL,62701,hello world\n",
+    "utf-8": "{0},São Paulo,SP,01000,Crème brûlée\n",
+    "latin-1": "{0},São Paulo,SP,01000,Crème brûlée\n",
+    "windows-1251": "{0},Москва,RU,101000,Привет мир\n",
+    "shift_jis": "{0},東京都,JP,1000001,こんにちは世界\n",
+    "utf-16-le": "{0},Springfield,IL,62701,hello world\n",
+}
+
+
+def sample(encoding: str, size: int) -> bytes:
+    """
+    Returns a CSV-like sample of exactly the given size in the given encoding.
+    """
+    result = bytearray()
+    index = 0
+    while len(result) < size:
+        result.extend(ROWS[encoding].format(index).encode(encoding))
+        index = index + 1
+    return bytes(result[:size])
+
+
+def measure(function, repeat=5) -> float:
+    """
+    Returns the best observed time of the given function in seconds.
+    """
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def main():
+    print(f"{'encoding':<14}{'size':>10}{'detected':>16}{'tiered ms':>12}{'chardet ms':>12}{'speedup':>10}")
+    for encoding in ENCODINGS:
+        for size in SIZES:
+            chunk = sample(encoding, size)
+            detected = _detect_encoding(chunk)
+            tiered = measure(lambda: _detect_encoding(chunk))
+            full = measure(lambda: chardet.detect(chunk))
+            print(f"{encoding:<14}{size:>10}{detected:>16}{tiered * 1000:>12.3f}{full * 1000:>12.3f}"
+                  f"{full / tiered:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Compares the time each available spreadsheet engine takes to parse generated CSV and XLSX files of
+typical sizes. XLS files cannot be generated without an XLS writer, so they are not covered.
+
+    python3 -m benchmarks.bench_engines [rows ...]
+"""
+import io
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+import openpyxl
+from pandas import DataFrame, date_range
+
+from toolforgeio.io import _available_engines, _parse_spreadsheet_file
+
+ROWS = [10000, 100000]
+
+COLUMNS = 10
+
+
+def generate(directory: str, rows: int) -> dict:
+    """
+    Generates CSV and XLSX files with the given number of rows of mixed data.
+
+    :return: A dict from extension to the path of the generated file
+    """
+    df = DataFrame({f"column{index}": range(index, index + rows) for index in range(COLUMNS - 4)})
+    df["name"] = [f"name{index % 1000}" for index in range(rows)]
+    df["status"] = [["active", "inactive", "pending"][index % 3] for index in range(rows)]
+    df["score"] = [index / 7 for index in range(rows)]
+    df["created"] = date_range("2020-01-01", periods=rows, freq="min")
+
+    csv_path = os.path.join(directory, f"{rows}.csv")
+    df.to_csv(csv_path, index=False)
+
+    xlsx_path = os.path.join(directory, f"{rows}.xlsx")
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(list(df.columns))
+    for row in df.itertuples(index=False, name=None):
+        ws.append(row)
+    wb.save(xlsx_path)
+
+    return {"csv": csv_path, "xlsx": xlsx_path}
+
+
+def main(rows: list):
+    print(f"{'format':<8}{'rows':>10}{'size MB':>10}{'engine':>12}{'seconds':>10}{'rows/s':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        for count in rows:
+            for extension, filepath in generate(directory, count).items():
+                size = os.path.getsize(filepath) / 1024 / 1024
+                for engine in _available_engines(extension):
+                    with redirect_stdout(io.StringIO()):
+                        start = time.perf_counter()
+                        _parse_spreadsheet_file(filepath, extension, engine=engine)
+                        elapsed = time.perf_counter() - start
+                    print(f"{extension:<8}{count:>10}{size:>10.1f}{engine:>12}{elapsed:>10.3f}{count / elapsed:>12.0f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or ROWS)
@@ -0,0 +1,261 @@
+"""
+Measures the wall time, throughput, and peak memory of reading and writing generated CSV, XLSX,
+and, where xlwt is installed, XLS files of 1KB to 1GB, over file:// URLs and over a local threaded
+HTTP server. Each case runs in its own process, so that its peak memory is its own.
+
+Results are written as JSON along with the commit that produced them, and two results files can be
+compared to find regressions:
+
+    python3 -m benchmarks.bench_io [--sizes 1KB 1MB ...] [--output results.json]
+    python3 -m benchmarks.bench_io compare base.json head.json [--threshold 0.1]
+"""
+import argparse
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager, redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.support import SIZES, environment, generate_inputs
+
+DEFAULT_SIZES = ["1KB", "1MB", "32MB"]
+
+OPERATIONS = ["read_input_spreadsheet_data_frame", "read_input_file", "write_output_file"]
+
+PROTOCOLS = ["file", "http"]
+
+# The fraction by which a case must slow down, or grow in memory, to count as a regression. Timings
+# of very short cases are noisy, so those under MIN_SECONDS are only compared for memory.
+THRESHOLD = 0.1
+
+MIN_SECONDS = 0.05
+
+BLOCK_SIZE = 1024 * 1024
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    Serves files from the server's directory, with support for byte ranges, and discards uploads.
+    """
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        filepath = os.path.join(self.server.directory, os.path.basename(self.path))
+        if not os.path.isfile(filepath):
+            self.send_error(404)
+            return
+        size = os.path.getsize(filepath)
+        start, end = 0, size - 1
+        if self.headers.get("Range", "").startswith("bytes="):
+            start, end = self.headers["Range"][6:].split("-")
+            start, end = int(start), min(int(end), size - 1)
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+            self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        with open(filepath, "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(BLOCK_SIZE, remaining))
+                self.wfile.write(chunk)
+                remaining = remaining - len(chunk)
+
+    def do_PUT(self):
+        if self.headers.get("Transfer-Encoding") == "chunked":
+            while length := int(self.rfile.readline().strip(), 16):
+                self.rfile.read(length)
+                self.rfile.readline()
+            self.rfile.readline()
+        else:
+            remaining = int(self.headers.get("Content-Length", 0))
+            while remaining > 0:
+                remaining = remaining - len(self.rfile.read(min(BLOCK_SIZE, remaining)))
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+@contextmanager
+def serve(directory: str):
+    """
+    Serves the given directory over HTTP on a free local port.
+
+    :return: The base URL of the server
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    server.directory = directory
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def run_case(operation: str, url: str, filepath: str, scratch: str) -> dict:
+    """
+    Runs one operation once in this process.
+
+    :param operation: One of OPERATIONS
+    :param url: The URL to read from or write to
+    :param filepath: The path of the generated input
+    :param scratch: A directory for downloads and outputs
+    :return: The case's wall time in seconds, bytes moved, and peak resident memory in bytes
+    """
+    from toolforgeio import http
+    from toolforgeio import io as toolforgeio_io
+    from toolforgeio.tracing import _peak_rss
+
+    # Import time is measured by tests/test_imports.py, so keep it out of the timings here.
+    import pandas  # noqa: F401
+    http.get_session()
+
+    size = os.path.getsize(filepath)
+    with redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        if operation == "read_input_spreadsheet_data_frame":
+            toolforgeio_io.read_input_spreadsheet_data_frame(url, prefix=scratch)
+        elif operation == "read_input_file":
+            with open(os.path.join(scratch, "download"), "wb") as f:
+                toolforgeio_io.read_input_file(url, f)
+        elif operation == "write_output_file":
+            with open(filepath, "rb") as f:
+                toolforgeio_io.write_output_file(url, f)
+        else:
+            raise ValueError(f"unrecognized operation: {operation}")
+        elapsed = time.perf_counter() - start
+    return {"seconds": elapsed, "bytes": size, "throughput": size / elapsed, "peak_rss": _peak_rss()}
+
+
+def _url(operation: str, protocol: str, filepath: str, scratch: str, base_url: str) -> str:
+    name = os.path.basename(filepath)
+    if operation == "write_output_file":
+        return "file://" + os.path.join(scratch, name) if protocol == "file" else f"{base_url}/{name}"
+    return "file://" + filepath if protocol == "file" else f"{base_url}/{name}"
+
+
+def run(sizes: list, repeat: int = 1) -> list:
+    """
+    Generates inputs of the given sizes, and runs every operation on each over every protocol, each
+    in its own process.
+
+    :param sizes: The names of the sizes to generate, as in support.SIZES
+    :param repeat: The number of times to run each case, keeping the fastest
+    :return: A list of results, one per case
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as directory, serve(directory) as base_url:
+        inputs = generate_inputs(directory, sizes)
+        for filepath, extension, encoding, size_name in inputs:
+            for operation in OPERATIONS:
+                for protocol in PROTOCOLS:
+                    best = None
+                    for _ in range(repeat):
+                        scratch = tempfile.mkdtemp(dir=directory)
+                        try:
+                            url = _url(operation, protocol, filepath, scratch, base_url)
+                            case = json.dumps({"operation": operation, "url": url, "filepath": filepath,
+                                               "scratch": scratch})
+                            output = subprocess.run([sys.executable, "-m", "benchmarks.bench_io", "case", case],
+                                                    capture_output=True, text=True, check=True).stdout
+                            measured = json.loads(output.splitlines()[-1])
+                        finally:
+                            shutil.rmtree(scratch)
+                        if best is None or measured["seconds"] < best["seconds"]:
+                            best = measured
+                    result = {"operation": operation, "protocol": protocol, "format": extension,
+                              "encoding": encoding, "size": size_name, **best}
+                    print(f"{operation:<36}{protocol:<6}{extension:<6}{encoding or '':<18}{size_name:>6}"
+                          f"{best['seconds']:>10.3f}{best['throughput'] / 1024 / 1024:>10.1f}"
+                          f"{best['peak_rss'] / 1024 / 1024:>10.1f}", file=sys.stderr)
+                    results.append(result)
+    return results
+
+
+def _key(result: dict) -> tuple:
+    return result["operation"], result["protocol"], result["format"], result["encoding"], result["size"]
+
+
+def compare(base: dict, head: dict, threshold: float = THRESHOLD) -> list:
+    """
+    Compares two sets of results, and prints the change in time and memory of each case in both.
+
+    :return: A list of descriptions of the cases that regressed by more than the threshold
+    """
+    base_results = {_key(result): result for result in base["results"]}
+    regressions = []
+    print(f"base {base['environment']['commit']}, head {head['environment']['commit']}")
+    print(f"{'case':<72}{'seconds':>10}{'change':>9}{'peak MB':>10}{'change':>9}")
+    for result in head["results"]:
+        before = base_results.get(_key(result))
+        if before is None:
+            continue
+        time_change = result["seconds"] / before["seconds"] - 1
+        memory_change = result["peak_rss"] / before["peak_rss"] - 1
+        name = " ".join(str(part) for part in _key(result) if part is not None)
+        print(f"{name:<72}{result['seconds']:>10.3f}{time_change:>+9.1%}"
+              f"{result['peak_rss'] / 1024 / 1024:>10.1f}{memory_change:>+9.1%}")
+        if time_change > threshold and max(result["seconds"], before["seconds"]) >= MIN_SECONDS:
+            regressions.append(f"{name}: {time_change:+.1%} time")
+        if memory_change > threshold:
+            regressions.append(f"{name}: {memory_change:+.1%} peak memory")
+    return regressions
+
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["case"]:
+        case = json.loads(argv[1])
+        print(json.dumps(run_case(case["operation"], case["url"], case["filepath"], case["scratch"])))
+        return 0
+
+    if argv[:1] == ["compare"]:
+        parser = argparse.ArgumentParser(prog="python3 -m benchmarks.bench_io compare")
+        parser.add_argument("base", help="The results to compare against")
+        parser.add_argument("head", help="The results to check for regressions")
+        parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                            help="The fractional slowdown or growth that counts as a regression")
+        options = parser.parse_args(argv[1:])
+        with open(options.base) as f:
+            base = json.load(f)
+        with open(options.head) as f:
+            head = json.load(f)
+        regressions = compare(base, head, options.threshold)
+        for regression in regressions:
+            print(f"regression: {regression}")
+        return 1 if regressions else 0
+
+    parser = argparse.ArgumentParser(prog="python3 -m benchmarks.bench_io")
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES, choices=list(SIZES),
+                        help="The sizes of inputs to generate")
+    parser.add_argument("--repeat", type=int, default=1, help="Run each case this many times, keeping the fastest")
+    parser.add_argument("--output", help="Write results to this file instead of stdout")
+    options = parser.parse_args(argv)
+
+    print(f"{'operation':<36}{'proto':<6}{'format':<6}{'encoding':<18}{'size':>6}{'seconds':>10}{'MB/s':>10}"
+          f"{'peak MB':>10}", file=sys.stderr)
+    results = {"environment": environment(), "results": run(options.sizes, options.repeat)}
+    if options.output:
+        with open(options.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
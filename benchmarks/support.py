@@ -0,0 +1,145 @@
+"""
+Helpers shared by the benchmarks: generating spreadsheet inputs of a given size, and describing the
+code and machine that produced a set of results.
+"""
+import importlib.util
+import os
+import platform
+import subprocess
+import sys
+
+# The character sets in which to generate CSV inputs, and whether each gets a BOM
+CSV_ENCODINGS = [("utf-8", False), ("utf-8", True), ("utf-16-le", True), ("windows-1252", False)]
+
+BOMS = {"utf-8": b"\xEF\xBB\xBF", "utf-16-le": b"\xFF\xFE"}
+
+HEADER = ["id", "name", "city", "status", "score", "created"]
+
+CITIES = ["Springfield", "São Paulo", "Zürich", "Montréal", "Köln"]
+
+STATUSES = ["active", "inactive", "pending"]
+
+SIZES = {
+    "1KB": 1024,
+    "1MB": 1024 * 1024,
+    "32MB": 32 * 1024 * 1024,
+    "256MB": 256 * 1024 * 1024,
+    "1GB": 1024 * 1024 * 1024,
+}
+
+# XLSX files take far longer to write and parse than CSV files of the same size, and XLS sheets
+# cannot hold more than 65,536 rows, so larger sizes are only generated as CSV.
+MAX_XLSX_SIZE = 32 * 1024 * 1024
+
+MAX_XLS_SIZE = 4 * 1024 * 1024
+
+
+def rows(count: int, start: int = 0):
+    """
+    Yields the given number of rows of mixed data, after the header.
+    """
+    for index in range(start, start + count):
+        yield [index, f"name {index % 1000}", CITIES[index % len(CITIES)], STATUSES[index % len(STATUSES)],
+               index / 7, f"2020-01-{index % 28 + 1:02d} 12:00:00"]
+
+
+def _csv_block(count: int, start: int, encoding: str) -> bytes:
+    return "".join(",".join(str(value) for value in row) + "\n" for row in rows(count, start)).encode(encoding)
+
+
+def generate_csv(filepath: str, size: int, encoding: str = "utf-8", bom: bool = False) -> str:
+    """
+    Writes a CSV file of about the given size in bytes in the given character set.
+    """
+    with open(filepath, "wb") as f:
+        if bom:
+            f.write(BOMS[encoding])
+        f.write((",".join(HEADER) + "\n").encode(encoding))
+        written = f.tell()
+        start = 0
+        while written < size:
+            # Write in blocks of about 1MB, or less for small files
+            block = _csv_block(max(1, min(16384, (size - written) // 48)), start, encoding)
+            f.write(block)
+            written = written + len(block)
+            start = start + 16384
+    return filepath
+
+
+def generate_xlsx(filepath: str, size: int) -> str:
+    """
+    Writes an XLSX file whose uncompressed sheet data is about the given size in bytes.
+    """
+    import openpyxl
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("data")
+    ws.append(HEADER)
+    for row in rows(max(1, size // 48)):
+        ws.append(row)
+    wb.save(filepath)
+    return filepath
+
+
+def generate_xls(filepath: str, size: int):
+    """
+    Writes an XLS file of about the given size in bytes, if xlwt is installed.
+
+    :return: The path of the file, or None if XLS files cannot be written here
+    """
+    if importlib.util.find_spec("xlwt") is None:
+        return None
+    import xlwt
+
+    wb = xlwt.Workbook()
+    ws = wb.add_sheet("data")
+    for column, name in enumerate(HEADER):
+        ws.write(0, column, name)
+    for index, row in enumerate(rows(min(65535, max(1, size // 48)))):
+        for column, value in enumerate(row):
+            ws.write(index + 1, column, value)
+    wb.save(filepath)
+    return filepath
+
+
+def generate_inputs(directory: str, sizes: list) -> list:
+    """
+    Generates every input for the given sizes in the given directory.
+
+    :return: A list of tuples of the path, format, encoding, and nominal size of each input
+    """
+    inputs = []
+    for size_name in sizes:
+        size = SIZES[size_name]
+        for encoding, bom in CSV_ENCODINGS:
+            name = f"{size_name}-{encoding}{'-bom' if bom else ''}.csv"
+            generate_csv(os.path.join(directory, name), size, encoding, bom)
+            inputs.append((os.path.join(directory, name), "csv", encoding + ("-bom" if bom else ""), size_name))
+        if size <= MAX_XLSX_SIZE:
+            inputs.append((generate_xlsx(os.path.join(directory, f"{size_name}.xlsx"), size), "xlsx", None,
+                           size_name))
+        if size <= MAX_XLS_SIZE:
+            filepath = generate_xls(os.path.join(directory, f"{size_name}.xls"), size)
+            if filepath is not None:
+                inputs.append((filepath, "xls", None, size_name))
+    return inputs
+
+
+def environment() -> dict:
+    """
+    Describes the code and machine that are running the benchmarks, so that results from different
+    commits can be matched up.
+    """
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    return {
+        "commit": git("rev-parse", "HEAD"),
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
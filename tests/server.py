@@ -0,0 +1,116 @@
+import threading
+from hashlib import md5
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _fail(self) -> bool:
+        if self.server.failures.get(self.path, 0) > 0:
+            self.server.failures[self.path] = self.server.failures[self.path] - 1
+            self.send_error(503)
+            return True
+        return False
+
+    def do_GET(self):
+        self.server.requests.append((self.command, self.path, dict(self.headers)))
+        if self._fail():
+            return
+        data = self.server.files.get(self.path)
+        if data is None:
+            self.send_error(404)
+            return
+
+        etag = '"' + md5(data).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        if self.server.accept_ranges and self.headers.get("Range", "").startswith("bytes="):
+            start, end = self.headers["Range"][6:].split("-")
+            start, end = int(start), min(int(end), len(data) - 1)
+            self.send_response(206)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+            self.send_header("Content-Length", str(end - start + 1))
+            self.end_headers()
+            self.wfile.write(data[start:end + 1])
+            return
+
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        if self.server.accept_ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_PUT(self):
+        self.server.requests.append((self.command, self.path, dict(self.headers)))
+        if self.headers.get("Transfer-Encoding") == "chunked":
+            chunks = []
+            while length := int(self.rfile.readline().strip(), 16):
+                chunks.append(self.rfile.read(length))
+                self.rfile.readline()
+            self.rfile.readline()
+            data = b"".join(chunks)
+        else:
+            data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self._fail():
+            return
+        self.server.files[self.path] = data
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+class LocalServer:
+    """
+    A threaded HTTP server on localhost that stands in for object storage in tests. GET serves the
+    bytes in files by path with an ETag and, if accept_ranges is set, supports range requests.
+    PUT stores the request body in files. Requests to paths in failures fail with 503 that many
+    times first.
+    """
+
+    def __init__(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.files = {}
+        self.server.requests = []
+        self.server.failures = {}
+        self.server.accept_ranges = True
+        self.thread = threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+
+    @property
+    def files(self) -> dict:
+        return self.server.files
+
+    @property
+    def requests(self) -> list:
+        return self.server.requests
+
+    @property
+    def failures(self) -> dict:
+        return self.server.failures
+
+    @property
+    def accept_ranges(self) -> bool:
+        return self.server.accept_ranges
+
+    @accept_ranges.setter
+    def accept_ranges(self, value: bool):
+        self.server.accept_ranges = value
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.server.server_port}{path}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
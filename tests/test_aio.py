@@ -0,0 +1,134 @@
+import asyncio
+import gzip
+import importlib.util
+import io
+import os
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from unittest import mock
+
+from tests.server import LocalServer
+from toolforgeio import aio
+from toolforgeio.profile import ResourceProfile, set_resource_profile
+
+current_path = Path(os.path.dirname(os.path.realpath(__file__)))
+
+requires_aiohttp = unittest.skipUnless(importlib.util.find_spec("aiohttp"), "requires aiohttp")
+
+
+class AioTests(unittest.IsolatedAsyncioTestCase):
+    async def test_file_urls(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filepath = os.path.join(directory, "data.bin")
+            async with aio.Client() as client:
+                await client.write_output_file(f"file://{filepath}", io.BytesIO(b"hello world"))
+                data = io.BytesIO()
+                await client.read_input_file(f"file://{filepath}", data)
+            self.assertEqual(data.getvalue(), b"hello world")
+
+    async def test_read_spreadsheet(self):
+        async with aio.Client(max_concurrency=2) as client:
+            for filename in ["legacy.xls", "ooxml.xlsx", "with-bom.csv"]:
+                filepath = current_path / "spreadsheets" / filename
+                df = await client.read_input_spreadsheet_data_frame(f"file://{filepath}")
+                rows = [list(df.columns)] + [list(row) for row in df.itertuples(index=False)]
+                self.assertEqual(rows, [["hello", "world"], ["alpha", "bravo"]])
+
+    async def test_unrecognized_protocol(self):
+        with self.assertRaises(ValueError):
+            await aio.read_input_file("ftp://example.com/data.bin", io.BytesIO())
+
+    @requires_aiohttp
+    async def test_http_urls(self):
+        with LocalServer() as server, tempfile.TemporaryDirectory() as directory, \
+                mock.patch("toolforgeio.http.BACKOFF_FACTOR", 0):
+            server.failures["/data.bin"] = 1
+            async with aio.Client() as client:
+                await client.write_output_file(server.url("/data.bin"), io.BytesIO(b"hello world"))
+                self.assertEqual(server.files["/data.bin"], b"hello world")
+
+                data = io.BytesIO()
+                await client.read_input_file(server.url("/data.bin"), data)
+                self.assertEqual(data.getvalue(), b"hello world")
+
+                server.files["/ooxml.xlsx"] = (current_path / "spreadsheets" / "ooxml.xlsx").read_bytes()
+                frames = await asyncio.gather(*[
+                    client.read_input_spreadsheet_data_frame(server.url("/ooxml.xlsx"), prefix=directory)
+                    for _ in range(3)])
+                for df in frames:
+                    self.assertEqual(list(df.columns), ["hello", "world"])
+            self.assertEqual(os.listdir(directory), [])
+
+    @requires_aiohttp
+    async def test_put_file_retries(self):
+        with LocalServer() as server, tempfile.TemporaryFile() as f, \
+                mock.patch("toolforgeio.http.BACKOFF_FACTOR", 0):
+            f.write(b"header" + b"hello world" * 1000)
+            f.seek(len(b"header"))
+            server.failures["/data.bin"] = 2
+            await aio.write_output_file(server.url("/data.bin"), f)
+            self.assertEqual(server.files["/data.bin"], b"hello world" * 1000)
+            self.assertEqual(len(server.requests), 3)
+            self.assertEqual(server.requests[-1][2].get("Content-Length"), str(len(b"hello world" * 1000)))
+            self.assertFalse(f.closed)
+
+    @requires_aiohttp
+    async def test_compressed_http_urls(self):
+        with LocalServer() as server, tempfile.TemporaryDirectory() as directory:
+            server.files["/data.csv.gz"] = gzip.compress((current_path / "spreadsheets" / "with-bom.csv").read_bytes())
+            df = await aio.read_input_spreadsheet_data_frame(server.url("/data.csv.gz"), prefix=directory)
+            rows = [list(df.columns)] + [list(row) for row in df.itertuples(index=False)]
+            self.assertEqual(rows, [["hello", "world"], ["alpha", "bravo"]])
+
+    async def test_process_pool_file_urls(self):
+        with tempfile.TemporaryDirectory() as directory, ProcessPoolExecutor(2) as executor:
+            filepath = os.path.join(directory, "data.bin")
+            async with aio.Client(executor=executor) as client:
+                await client.write_output_file(f"file://{filepath}", io.BytesIO(b"hello world"))
+                data = io.BytesIO()
+                await client.read_input_file(f"file://{filepath}", data)
+                self.assertEqual(data.getvalue(), b"hello world")
+
+                df = await client.read_input_spreadsheet_data_frame(
+                    f"file://{current_path / 'spreadsheets' / 'ooxml.xlsx'}")
+                self.assertEqual(list(df.columns), ["hello", "world"])
+
+    @requires_aiohttp
+    async def test_process_pool_http_urls(self):
+        self.addCleanup(set_resource_profile, None)
+        with LocalServer() as server, tempfile.TemporaryDirectory() as directory, ProcessPoolExecutor(2) as executor:
+            server.files["/data.bin"] = b"hello world"
+            async with aio.Client(executor=executor) as client:
+                data = io.BytesIO()
+                await client.read_input_file(server.url("/data.bin"), data)
+                self.assertEqual(data.getvalue(), b"hello world")
+
+                # Small downloads are sent to the executor as bytes, and large ones as paths
+                for threshold in [1024 * 1024, 1024]:
+                    set_resource_profile(ResourceProfile("test", 1024 ** 3, 2, 1024, 10, threshold, 1024 ** 3))
+                    for filename in ["ooxml.xlsx", "with-bom.csv", "legacy.xls"]:
+                        server.files["/" + filename] = (current_path / "spreadsheets" / filename).read_bytes()
+                        df = await client.read_input_spreadsheet_data_frame(server.url("/" + filename),
+                                                                            prefix=directory)
+                        rows = [list(df.columns)] + [list(row) for row in df.itertuples(index=False)]
+                        self.assertEqual(rows, [["hello", "world"], ["alpha", "bravo"]])
+            self.assertEqual(os.listdir(directory), [])
+
+    @requires_aiohttp
+    async def test_cancel(self):
+        with LocalServer() as server, tempfile.TemporaryDirectory() as directory:
+            server.files["/data.csv"] = b"hello,world\n" * 1000000
+            async with aio.Client() as client:
+                task = asyncio.create_task(client.read_input_spreadsheet_data_frame(server.url("/data.csv"),
+                                                                                     prefix=directory))
+                await asyncio.sleep(0.05)
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+            self.assertEqual(os.listdir(directory), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -39,3 +39,20 @@ class ArgumentsTests(unittest.TestCase):
         self.assertEqual(args.get("DateParameter"), datetime(2020, 1, 1, 0, 0))
         self.assertEqual(args.get("BooleanParameter"), True)
         self.assertEqual(args.get("StringParameter"), "hello")
+
+    def test_specialize_required(self):
+        manifest = ToolManifest(
+            1.0,
+            "abcd1234",
+            ManifestEnvironment("medium", [], []),
+            [ToolManifestParameter("int", "IntParameter", "Int Description", True),
+             ToolManifestParameter("float", "FloatParameter", "Float Description", False)],
+            [],
+            [])
+
+        args = Arguments.parse_from_argv(["python3", "--IntParameter", "10"]).specialize(manifest)
+        self.assertEqual(args.get("IntParameter"), 10)
+        self.assertEqual(args.get("FloatParameter"), None)
+
+        with self.assertRaises(ValueError):
+            Arguments.parse_from_argv(["python3", "--FloatParameter", "1.2"]).specialize(manifest)
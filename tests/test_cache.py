@@ -0,0 +1,132 @@
+import importlib.util
+import io
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from pandas import isna
+from pandas.testing import assert_frame_equal
+
+from tests.server import LocalServer
+from toolforgeio.cache import FrameCache, InputCache
+from toolforgeio.io import read_input_file, read_input_spreadsheet_data_frame
+
+current_path = Path(os.path.dirname(os.path.realpath(__file__)))
+
+
+class InputCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_hit_and_miss(self):
+        with LocalServer() as server:
+            server.files["/data.bin"] = b"hello world"
+            cache = InputCache(self.directory.name)
+
+            for _ in range(3):
+                data = io.BytesIO()
+                read_input_file(server.url("/data.bin"), data, cache=cache)
+                self.assertEqual(data.getvalue(), b"hello world")
+
+            self.assertEqual(cache.misses, 1)
+            self.assertEqual(cache.hits, 2)
+            self.assertIsNotNone(server.requests[-1][2].get("If-None-Match"))
+
+            server.files["/data.bin"] = b"goodbye world"
+            data = io.BytesIO()
+            read_input_file(server.url("/data.bin"), data, cache=cache)
+            self.assertEqual(data.getvalue(), b"goodbye world")
+            self.assertEqual(cache.misses, 2)
+
+    def test_eviction(self):
+        with LocalServer() as server:
+            cache = InputCache(self.directory.name, max_bytes=2500)
+            for index in range(5):
+                server.files[f"/{index}.bin"] = bytes([index]) * 1000
+                read_input_file(server.url(f"/{index}.bin"), io.BytesIO(), cache=cache)
+
+            blobs = os.listdir(os.path.join(self.directory.name, "blobs"))
+            self.assertEqual(len(blobs), 2)
+            # The URLs of evicted files are forgotten too
+            refs = os.listdir(os.path.join(self.directory.name, "refs"))
+            self.assertEqual(len(refs), 2)
+
+            # The most recently used files survive
+            data = io.BytesIO()
+            read_input_file(server.url("/4.bin"), data, cache=cache)
+            self.assertEqual(data.getvalue(), bytes([4]) * 1000)
+            self.assertEqual(cache.hits, 1)
+
+    def test_read_spreadsheet(self):
+        with LocalServer() as server:
+            cache = InputCache(self.directory.name)
+            for filename in ["legacy.xls", "ooxml.xlsx", "with-bom.csv"]:
+                server.files["/" + filename] = (current_path / "spreadsheets" / filename).read_bytes()
+                for _ in range(2):
+                    df = read_input_spreadsheet_data_frame(server.url("/" + filename), cache=cache)
+                    self.assertEqual(list(df.columns), ["hello", "world"])
+            self.assertEqual(cache.misses, 3)
+            self.assertEqual(cache.hits, 3)
+
+
+@unittest.skipUnless(importlib.util.find_spec("pyarrow"), "requires pyarrow")
+class FrameCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_read_spreadsheet(self):
+        frame_cache = FrameCache(self.directory.name)
+        for filename in ["legacy.xls", "ooxml.xlsx", "with-bom.csv"]:
+            filepath = current_path / "spreadsheets" / filename
+            for _ in range(2):
+                df = read_input_spreadsheet_data_frame(f"file://{filepath}", prefix=self.directory.name,
+                                                       frame_cache=frame_cache)
+                self.assertEqual(list(df.columns), ["hello", "world"])
+                self.assertEqual(list(df.iloc[0]), ["alpha", "bravo"])
+        self.assertEqual(frame_cache.misses, 3)
+        self.assertEqual(frame_cache.hits, 3)
+
+    def test_missing_values(self):
+        frame_cache = FrameCache(self.directory.name)
+        filepath = Path(self.directory.name, "input.csv")
+        filepath.write_text("hello,world,count\nalpha,,1\n,bravo,\ncharlie,delta,3\n")
+        expected = read_input_spreadsheet_data_frame(f"file://{filepath}")
+        frames = [read_input_spreadsheet_data_frame(f"file://{filepath}", prefix=self.directory.name,
+                                                    frame_cache=frame_cache) for _ in range(2)]
+        self.assertEqual(frame_cache.hits, 1)
+        for df in frames:
+            assert_frame_equal(df, expected)
+            for index in range(expected.shape[1]):
+                for actual_value, expected_value in zip(df.iloc[:, index], expected.iloc[:, index]):
+                    self.assertIs(type(actual_value), type(expected_value))
+                    self.assertEqual(isna(actual_value), isna(expected_value))
+
+    def test_sheet_hint_is_part_of_key(self):
+        frame_cache = FrameCache(self.directory.name)
+        filepath = current_path / "spreadsheets" / "multisheet.xlsx"
+        read_input_spreadsheet_data_frame(f"file://{filepath}", prefix=self.directory.name, frame_cache=frame_cache)
+        read_input_spreadsheet_data_frame(f"file://{filepath}", prefix=self.directory.name, frame_cache=frame_cache,
+                                          sheet_hint="bravo")
+        self.assertEqual(frame_cache.misses, 2)
+
+    def test_parse_options_are_part_of_key(self):
+        frame_cache = FrameCache(self.directory.name)
+        filepath = current_path / "spreadsheets" / "with-bom.csv"
+        df = read_input_spreadsheet_data_frame(f"file://{filepath}", prefix=self.directory.name,
+                                               frame_cache=frame_cache)
+        self.assertEqual(list(df.columns), ["hello", "world"])
+        df = read_input_spreadsheet_data_frame(f"file://{filepath}", prefix=self.directory.name,
+                                               frame_cache=frame_cache, usecols=["world"])
+        self.assertEqual(list(df.columns), ["world"])
+        self.assertEqual(frame_cache.misses, 2)
+
+    def test_disabled(self):
+        frame_cache = FrameCache(self.directory.name, enabled=False)
+        filepath = current_path / "spreadsheets" / "with-bom.csv"
+        for _ in range(2):
+            read_input_spreadsheet_data_frame(f"file://{filepath}", prefix=self.directory.name, frame_cache=frame_cache)
+        self.assertEqual(frame_cache.hits, 0)
+        self.assertEqual(os.listdir(os.path.join(self.directory.name, "frames")), [])
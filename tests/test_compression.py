@@ -0,0 +1,87 @@
+import bz2
+import gzip
+import importlib.util
+import io
+import os
+import unittest
+import zipfile
+from pathlib import Path
+
+from toolforgeio.compression import compress, compression_for_extension, decompress, detect_compression
+
+current_path = Path(os.path.dirname(os.path.realpath(__file__)))
+
+COMPRESSIONS = ["gzip", "bz2", "zip"] + (["zstd"] if importlib.util.find_spec("zstandard") is not None else [])
+
+
+def _zip(entries: dict, compression=zipfile.ZIP_DEFLATED) -> bytes:
+    f = io.BytesIO()
+    with zipfile.ZipFile(f, "w", compression=compression) as archive:
+        for name, data in entries.items():
+            archive.writestr(name, data)
+    return f.getvalue()
+
+
+class _Unseekable(io.RawIOBase):
+    def __init__(self, data: bytes):
+        self.f = io.BytesIO(data)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        # Short reads, like a network stream
+        return self.f.readinto(memoryview(b)[:1000])
+
+
+class CompressionTests(unittest.TestCase):
+    def test_detect_compression(self):
+        data = b"hello,world\nalpha,bravo\n"
+        self.assertEqual(detect_compression(gzip.compress(data)), "gzip")
+        self.assertEqual(detect_compression(bz2.compress(data)), "bz2")
+        self.assertEqual(detect_compression(bz2.compress(b"")), "bz2")
+        self.assertEqual(detect_compression(_zip({"data.csv": data})), "zip")
+        self.assertEqual(detect_compression(b"\x28\xB5\x2F\xFD\x00"), "zstd")
+        self.assertIsNone(detect_compression(data))
+        self.assertIsNone(detect_compression(b"BZh,hello\n"))
+        self.assertIsNone(detect_compression((current_path / "spreadsheets" / "ooxml.xlsx").read_bytes()[:4096]))
+        self.assertIsNone(detect_compression(_zip({"xl/workbook.xml": b"", "data.csv": data})))
+
+    def test_compression_for_extension(self):
+        self.assertEqual(compression_for_extension("csv.gz"), "gzip")
+        self.assertEqual(compression_for_extension("CSV.ZST"), "zstd")
+        self.assertEqual(compression_for_extension("zip"), "zip")
+        self.assertIsNone(compression_for_extension("csv"))
+        self.assertIsNone(compression_for_extension("xlsx"))
+
+    def test_round_trip(self):
+        data = b"".join(f"{index},name {index % 100}\n".encode("utf-8") for index in range(100000))
+        chunks = [data[offset:offset + 65536] for offset in range(0, len(data), 65536)]
+        for compression in COMPRESSIONS:
+            compressed = b"".join(compress(iter(chunks), compression, "data.csv"))
+            self.assertEqual(detect_compression(compressed[:4096]), compression)
+            self.assertLess(len(compressed), len(data) / 5)
+            with decompress(io.BufferedReader(_Unseekable(compressed)), compression) as f:
+                self.assertEqual(f.read(), data)
+
+    def test_zip_entries(self):
+        data = b"hello,world\nalpha,bravo\n"
+        self.assertEqual(zipfile.ZipFile(io.BytesIO(b"".join(compress([data], "zip", "out.csv")))).namelist(),
+                         ["out.csv"])
+
+        # Stored entries, and entries followed by a data descriptor
+        stored = _zip({"data.csv": data}, zipfile.ZIP_STORED)
+        self.assertEqual(decompress(io.BytesIO(stored), "zip").read(), data)
+        streamed = b"".join(compress([data], "zip"))
+        self.assertEqual(decompress(io.BufferedReader(_Unseekable(streamed)), "zip").read(), data)
+
+        with self.assertRaisesRegex(ValueError, "single file"):
+            decompress(io.BytesIO(_zip({"a.csv": data, "b.csv": data})), "zip").read()
+        with self.assertRaisesRegex(ValueError, "single file"):
+            decompress(io.BytesIO(_zip({"a.csv": data, "b.csv": data}, zipfile.ZIP_STORED)), "zip").read()
+        with self.assertRaises(EOFError):
+            decompress(io.BytesIO(_zip({"data.csv": os.urandom(10000)})[:1000]), "zip").read()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import importlib.util
+import os
+import unittest
+from pathlib import Path
+
+from pandas import DataFrame
+from pandas.testing import assert_frame_equal
+
+from toolforgeio.frames import compact_data_frame
+from toolforgeio.io import read_input_spreadsheet_data_frame
+
+current_path = Path(os.path.dirname(os.path.realpath(__file__)))
+
+
+class FramesTests(unittest.TestCase):
+    def test_compact_data_frame(self):
+        df = DataFrame({
+            "id": range(1000),
+            "delta": [-1, 1] * 500,
+            "country": ["Germany", "France", "Spain", "Italy"] * 250,
+            "name": [f"name {i}" for i in range(1000)],
+            "score": [i / 4 for i in range(1000)],
+            "mixed": [1, "a"] * 500,
+        })
+        result = compact_data_frame(df)
+
+        self.assertEqual(str(result["id"].dtype), "int64")
+        self.assertEqual(str(result["delta"].dtype), "int64")
+        self.assertEqual(str(result["country"].dtype), "category")
+        self.assertEqual(str(result["score"].dtype), "float64")
+        self.assertEqual(str(result["mixed"].dtype), "object")
+        if importlib.util.find_spec("pyarrow") is not None:
+            self.assertEqual(str(result["name"].dtype), "string")
+
+        usage = result.attrs["memory_usage"]
+        self.assertLess(usage["after"], usage["before"])
+        assert_frame_equal(result, df, check_dtype=False, check_categorical=False)
+
+        downcast = compact_data_frame(df, downcast_ints=True)
+        self.assertEqual(str(downcast["id"].dtype), "int16")
+        self.assertEqual(str(downcast["delta"].dtype), "int8")
+        self.assertEqual(str(compact_data_frame(df, downcast_floats=True)["score"].dtype), "float32")
+        self.assertEqual(str(compact_data_frame(df, category_ratio=1.0)["country"].dtype),
+                         str(result["name"].dtype))
+
+    def test_duplicate_column_names(self):
+        df = DataFrame([[1, "a"], [2, "a"]], columns=["x", "x"])
+        result = compact_data_frame(df)
+        self.assertEqual([str(dtype) for dtype in result.dtypes], ["int64", "category"])
+
+    def test_read_compact(self):
+        filepath = current_path / "spreadsheets" / "with-bom.csv"
+        df = read_input_spreadsheet_data_frame(f"file://{filepath}", compact=True)
+        self.assertEqual(list(df.columns), ["hello", "world"])
+        self.assertIn("memory_usage", df.attrs)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+import gzip
+import io
+import os
+import random
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import requests
+from pandas import DataFrame
+
+from tests.server import LocalServer
+from toolforgeio import http
+from toolforgeio.io import read_input_file, read_input_spreadsheet_data_frame, write_output_file, \
+    write_output_data_frame
+
+# Makes the test data look like a spreadsheet that must be downloaded to disk
+XLSX_PREFIX = b"\x50\x4B"
+
+
+class HttpTests(unittest.TestCase):
+    def setUp(self):
+        http.set_session(http.new_session(retries=2, backoff_factor=0))
+        self.addCleanup(http.set_session, None)
+
+    def test_shared_session(self):
+        self.assertIs(http.get_session(), http.get_session())
+
+    def test_get_retries(self):
+        with LocalServer() as server:
+            server.files["/data.bin"] = b"hello world"
+            server.failures["/data.bin"] = 2
+            data = io.BytesIO()
+            read_input_file(server.url("/data.bin"), data)
+            self.assertEqual(data.getvalue(), b"hello world")
+            self.assertEqual(len(server.requests), 3)
+
+    def test_put_retries(self):
+        with LocalServer() as server:
+            server.failures["/data.bin"] = 2
+            write_output_file(server.url("/data.bin"), io.BytesIO(b"hello world"))
+            self.assertEqual(server.files["/data.bin"], b"hello world")
+            self.assertEqual(len(server.requests), 3)
+
+    def test_put_data_frame_retries(self):
+        expected = DataFrame({"id": range(25), "name": [f"name{i % 7}" for i in range(25)]})
+        with LocalServer() as server, tempfile.TemporaryDirectory() as directory:
+            server.failures["/out.csv"] = 1
+            write_output_data_frame(server.url("/out.csv"), expected, batch_size=10, prefix=directory)
+            self.assertEqual(server.files["/out.csv"], expected.to_csv(index=False).encode("utf-8"))
+            self.assertEqual(len(server.requests), 2)
+
+    def test_put_compressed_retries(self):
+        with LocalServer() as server, tempfile.TemporaryDirectory() as directory:
+            server.failures["/data.bin.gz"] = 1
+            write_output_file(server.url("/data.bin.gz"), io.BytesIO(b"hello"), compression="gzip", prefix=directory)
+            self.assertEqual(gzip.decompress(server.files["/data.bin.gz"]), b"hello")
+            self.assertEqual(len(server.requests), 2)
+
+    def test_gives_up(self):
+        with LocalServer() as server:
+            server.files["/data.bin"] = b"hello world"
+            server.failures["/data.bin"] = 3
+            with self.assertRaises(requests.HTTPError):
+                read_input_file(server.url("/data.bin"), io.BytesIO())
+
+    def test_not_found(self):
+        with LocalServer() as server:
+            with self.assertRaises(requests.HTTPError):
+                read_input_file(server.url("/missing.bin"), io.BytesIO())
+
+
+@mock.patch("toolforgeio.io.RANGE_PART_SIZE", 1000)
+@mock.patch("toolforgeio.io.RANGE_THRESHOLD", 5000)
+class RangeDownloadTests(unittest.TestCase):
+    def setUp(self):
+        self.data = XLSX_PREFIX + random.Random(0).randbytes(9500)
+
+    def test_ranged_download(self):
+        with LocalServer() as server, tempfile.TemporaryFile() as f:
+            server.files["/data.bin"] = self.data
+            read_input_file(server.url("/data.bin"), f)
+            f.seek(0)
+            self.assertEqual(f.read(), self.data)
+            ranges = [headers["Range"] for method, path, headers in server.requests if "Range" in headers]
+            self.assertEqual(len(ranges), 9)
+            self.assertIn("bytes=9000-9501", ranges)
+
+    def test_ranged_download_at_offset(self):
+        with LocalServer() as server, tempfile.TemporaryFile() as f:
+            server.files["/data.bin"] = self.data
+            f.write(b"header")
+            read_input_file(server.url("/data.bin"), f)
+            f.write(b"footer")
+            f.seek(0)
+            self.assertEqual(f.read(), b"header" + self.data + b"footer")
+
+    def test_small_download(self):
+        with LocalServer() as server, tempfile.TemporaryFile() as f:
+            server.files["/data.bin"] = self.data[:4000]
+            read_input_file(server.url("/data.bin"), f)
+            f.seek(0)
+            self.assertEqual(f.read(), self.data[:4000])
+            self.assertEqual(len(server.requests), 1)
+
+    def test_no_ranges(self):
+        with LocalServer() as server, tempfile.TemporaryFile() as f:
+            server.files["/data.bin"] = self.data
+            server.accept_ranges = False
+            read_input_file(server.url("/data.bin"), f)
+            f.seek(0)
+            self.assertEqual(f.read(), self.data)
+            self.assertEqual(len(server.requests), 1)
+
+    def test_pipe(self):
+        with LocalServer() as server:
+            server.files["/data.bin"] = self.data
+            read_fd, write_fd = os.pipe()
+            received = []
+            reader = threading.Thread(target=lambda: received.append(os.fdopen(read_fd, "rb").read()))
+            reader.start()
+            with os.fdopen(write_fd, "wb") as f:
+                read_input_file(server.url("/data.bin"), f)
+            reader.join()
+            self.assertEqual(received, [self.data])
+            self.assertEqual(len(server.requests), 1)
+
+    def test_existing_content_kept(self):
+        with LocalServer() as server, tempfile.TemporaryFile() as f:
+            server.files["/data.bin"] = self.data
+            f.write(b"x" * (len(self.data) + 10))
+            f.seek(0)
+            read_input_file(server.url("/data.bin"), f)
+            f.seek(0)
+            self.assertEqual(f.read(), self.data + b"x" * 10)
+
+    def test_not_a_file(self):
+        with LocalServer() as server:
+            server.files["/data.bin"] = self.data
+            data = io.BytesIO()
+            read_input_file(server.url("/data.bin"), data)
+            self.assertEqual(data.getvalue(), self.data)
+            self.assertEqual(len(server.requests), 1)
+
+    def test_read_spreadsheet(self):
+        filepath = os.path.join(os.path.dirname(os.path.realpath(__file__)), "spreadsheets", "multisheet.xlsx")
+        with LocalServer() as server, tempfile.TemporaryDirectory() as directory:
+            with open(filepath, "rb") as f:
+                server.files["/multisheet.xlsx"] = f.read()
+            with mock.patch("toolforgeio.io.RANGE_PART_SIZE", 512), mock.patch("toolforgeio.io.RANGE_THRESHOLD", 1024):
+                df = read_input_spreadsheet_data_frame(server.url("/multisheet.xlsx"), prefix=directory,
+                                                       sheet_hint="bravo")
+            self.assertEqual(list(df.columns), ["hello", "world"])
+            self.assertGreater(len([request for request in server.requests if "Range" in request[2]]), 1)
+
+
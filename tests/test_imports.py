@@ -0,0 +1,61 @@
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+# The heavy modules that importing the package must not pull in.
+HEAVY_MODULES = ["pandas", "numpy", "openpyxl", "xlrd", "requests", "chardet", "pyarrow"]
+
+# A generous budget, in microseconds, for importing the package and the light public names. This
+# takes tens of milliseconds, while importing pandas alone takes hundreds.
+IMPORT_BUDGET = 150000
+
+root_path = Path(__file__).resolve().parent.parent
+
+
+def _import_times(code: str) -> dict:
+    """
+    Runs the given code in a new interpreter with -X importtime and returns the cumulative import
+    time in microseconds of each top-level module it imported.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            capture_output=True, text=True, check=True, cwd=root_path)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        times[name.strip()] = (len(name) - len(name.lstrip()), int(cumulative))
+    return times
+
+
+class ImportTests(unittest.TestCase):
+    def test_lazy_imports(self):
+        times = _import_times("from toolforgeio import Arguments, Manifest; import toolforgeio.io")
+        for module in HEAVY_MODULES:
+            self.assertNotIn(module, times)
+
+        top_level_indent = min(indent for indent, cumulative in times.values())
+        total = sum(cumulative for name, (indent, cumulative) in times.items()
+                    if name.split(".")[0] == "toolforgeio" and indent == top_level_indent)
+        self.assertLess(total, IMPORT_BUDGET)
+
+    def test_public_names(self):
+        result = subprocess.run([sys.executable, "-c", "import sys, toolforgeio; "
+                                                       "print('toolforgeio.io' in sys.modules); "
+                                                       "toolforgeio.read_input_spreadsheet_data_frame; "
+                                                       "print('toolforgeio.io' in sys.modules)"],
+                                capture_output=True, text=True, check=True, cwd=root_path)
+        self.assertEqual(result.stdout.split(), ["False", "True"])
+
+        import toolforgeio
+        for name in toolforgeio.__all__:
+            self.assertTrue(callable(getattr(toolforgeio, name)), name)
+        with self.assertRaises(AttributeError):
+            toolforgeio.foobar
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,33 @@
+import bz2
+import gzip
+import importlib.util
+import io
 import os
+import random
+import tempfile
 import unittest
+import zipfile
+from concurrent.futures import as_completed
+from hashlib import sha256
+from unittest import mock
 from pathlib import Path
 
-from toolforgeio.io import read_input_spreadsheet_data_frame
+import openpyxl
+import pandas
+from pandas import DataFrame, concat
+from pandas.testing import assert_frame_equal
+
+from tests.server import LocalServer
+from toolforgeio import tracing
+from toolforgeio.arguments import Arguments
+from toolforgeio.cache import InputCache
+from toolforgeio.compression import detect_compression
+from toolforgeio.manifest import ManifestEnvironment, ToolManifest, ToolManifestSlot
+from toolforgeio.profile import ResourceProfile, set_resource_profile
+from toolforgeio.io import read_input_spreadsheet_data_frame, read_input_spreadsheet_data_frames, \
+    iter_input_spreadsheet_chunks, read_input_file, \
+    write_output_file, write_output_data_frame, prefetch_inputs, _available_engines, _copy_stream, _detect_encoding, \
+    _xlsx_sheet_names, _Spool
 
 current_path = Path(os.path.dirname(os.path.realpath(__file__)))
 
@@ -37,3 +62,406 @@ class ArgumentsTests(unittest.TestCase):
             df = read_input_spreadsheet_data_frame(f"file://{filepath}", sheet_hint="bravo")
             rows = [list(df.columns)] + list(df.apply(lambda r: [r[0], r[1]], axis=1))
             self.assertEqual(rows, [["hello", "world"], ["alpha", "bravo"]])
+
+    def test_iter_chunks(self):
+        for filename in ["legacy.xls", "ooxml.xlsx", "with-bom.csv", "without-bom-utf-8.csv"]:
+            filepath = current_path / "spreadsheets" / filename
+            chunks = list(iter_input_spreadsheet_chunks(f"file://{filepath}", chunksize=1))
+            self.assertEqual(len(chunks), 1)
+            self.assertEqual(list(chunks[0].columns), ["hello", "world"])
+            self.assertEqual(list(chunks[0].iloc[0]), ["alpha", "bravo"])
+
+    def test_iter_chunks_sheet_hint(self):
+        filepath = current_path / "spreadsheets" / "multisheet.xlsx"
+        chunks = list(iter_input_spreadsheet_chunks(f"file://{filepath}", sheet_hint="bravo"))
+        self.assertEqual(list(chunks[0].iloc[0]), ["alpha", "bravo"])
+
+    def test_iter_chunks_matches_full_read(self):
+        names = [["", "NA", "#N/A"][i % 7] if i % 7 < 3 else f"name{i % 7}" for i in range(25)]
+        data = DataFrame({"id": range(25), "name": names})
+        expected = DataFrame({"id": range(25), "name": [float("nan") if i % 7 < 3 else names[i] for i in range(25)]})
+        with tempfile.TemporaryDirectory() as directory:
+            csv_path = os.path.join(directory, "data.csv")
+            data.to_csv(csv_path, index=False)
+
+            xlsx_path = os.path.join(directory, "data.xlsx")
+            wb = openpyxl.Workbook()
+            wb.active.append(list(data.columns))
+            for row in data.itertuples(index=False):
+                wb.active.append([value if value != "" else None for value in row])
+            wb.save(xlsx_path)
+
+            for filepath in [csv_path, xlsx_path]:
+                chunks = list(iter_input_spreadsheet_chunks(f"file://{filepath}", chunksize=10, prefix=directory))
+                self.assertEqual([len(chunk) for chunk in chunks], [10, 10, 5])
+                assert_frame_equal(concat(chunks), expected)
+                assert_frame_equal(read_input_spreadsheet_data_frame(f"file://{filepath}", prefix=directory),
+                                   expected)
+
+            header_csv_path = os.path.join(directory, "header.csv")
+            data.iloc[:0].to_csv(header_csv_path, index=False)
+            header_xlsx_path = os.path.join(directory, "header.xlsx")
+            wb = openpyxl.Workbook()
+            wb.active.append(list(data.columns))
+            wb.save(header_xlsx_path)
+
+            for filepath in [header_csv_path, header_xlsx_path]:
+                chunks = list(iter_input_spreadsheet_chunks(f"file://{filepath}", chunksize=10, prefix=directory))
+                self.assertEqual(len(chunks), 1)
+                self.assertEqual(list(chunks[0].columns), ["id", "name"])
+                self.assertEqual(len(chunks[0]), 0)
+
+    def test_pipelined_csv(self):
+        with LocalServer() as server, tempfile.TemporaryDirectory() as directory:
+            for filename in ["with-bom.csv", "without-bom-utf-8.csv", "ooxml.xlsx"]:
+                server.files["/" + filename] = (current_path / "spreadsheets" / filename).read_bytes()
+                df = read_input_spreadsheet_data_frame(server.url("/" + filename), prefix=directory)
+                rows = [list(df.columns)] + [list(row) for row in df.itertuples(index=False)]
+                self.assertEqual(rows, [["hello", "world"], ["alpha", "bravo"]])
+
+                chunks = list(iter_input_spreadsheet_chunks(server.url("/" + filename), prefix=directory))
+                self.assertEqual(list(chunks[0].iloc[0]), ["alpha", "bravo"])
+
+            # The CSV files were parsed as they downloaded, and the small XLSX file in memory
+            self.assertEqual(os.listdir(directory), [])
+
+    def test_detect_encoding(self):
+        text = "имя,город\n" + "".join(f"Иван {i},Москва столица России\n" for i in range(200))
+        self.assertEqual(_detect_encoding(b"hello,world\r\nalpha,bravo"), "utf-8")
+        self.assertEqual(_detect_encoding(text.encode("utf-8")), "utf-8")
+        self.assertEqual(_detect_encoding(text.encode("utf-8")[:-10]), "utf-8")
+        self.assertEqual(_detect_encoding(text.encode("cp1251")).lower(), "windows-1251")
+        self.assertEqual(_detect_encoding(text.encode("koi8-r")).lower(), "koi8-r")
+        self.assertEqual(_detect_encoding(("hello,world\n" * 100).encode("utf-16-le")).lower(), "utf-16le")
+
+    def test_file_inputs_read_in_place(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for filename in ["legacy.xls", "ooxml.xlsx", "with-bom.csv"]:
+                filepath = current_path / "spreadsheets" / filename
+                read_input_spreadsheet_data_frame(f"file://{filepath}", prefix=directory)
+                list(iter_input_spreadsheet_chunks(f"file://{filepath}", prefix=directory))
+            self.assertEqual(os.listdir(directory), [])
+
+    def test_copy_stream(self):
+        data = random.Random(0).randbytes(3 * 1024 * 1024 + 17)
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, "source.bin")
+            with open(source, "wb") as f:
+                f.write(data)
+
+            # File to file, from partway through the source and into the middle of the destination
+            with open(source, "rb") as fin, tempfile.TemporaryFile() as fout:
+                fin.read(17)
+                fout.write(b"header")
+                _copy_stream(fin, fout)
+                fout.write(b"footer")
+                self.assertEqual(fin.read(), b"")
+                fout.seek(0)
+                self.assertEqual(fout.read(), b"header" + data[17:] + b"footer")
+
+            # Streams that are not files
+            fout = io.BytesIO()
+            _copy_stream(io.BytesIO(data), fout)
+            self.assertEqual(fout.getvalue(), data)
+
+            # Through the public functions
+            destination = os.path.join(directory, "destination.bin")
+            with open(source, "rb") as fin:
+                write_output_file(f"file://{destination}", fin)
+            fout = io.BytesIO()
+            read_input_file(f"file://{destination}", fout)
+            self.assertEqual(fout.getvalue(), data)
+
+            # Compressed files have the file descriptor of the compressed data, not of the content
+            compressed = os.path.join(directory, "source.bin.gz")
+            with gzip.open(compressed, "wb") as f:
+                f.write(data)
+            with gzip.open(compressed, "rb") as fin:
+                write_output_file(f"file://{destination}", fin)
+            self.assertEqual(Path(destination).read_bytes(), data)
+            with open(source, "rb") as fin, gzip.open(compressed, "wb") as fout:
+                _copy_stream(fin, fout)
+            self.assertEqual(gzip.decompress(Path(compressed).read_bytes()), data)
+
+    def test_prefetch_inputs(self):
+        manifest = ToolManifest(1.0, "abcd1234", ManifestEnvironment("medium", [], []), [],
+                                [ToolManifestSlot("Alpha", "Alpha Description", ["csv"]),
+                                 ToolManifestSlot("Bravo", "Bravo Description", ["xlsx"]),
+                                 ToolManifestSlot("Charlie", "Charlie Description", ["xls"]),
+                                 ToolManifestSlot("Delta", "Delta Description", ["csv"])],
+                                [])
+        legacy_path = current_path / "spreadsheets" / "legacy.xls"
+        with LocalServer() as server, tempfile.TemporaryDirectory() as directory:
+            server.files["/alpha.csv"] = (current_path / "spreadsheets" / "with-bom.csv").read_bytes()
+            server.files["/bravo.xlsx"] = (current_path / "spreadsheets" / "ooxml.xlsx").read_bytes()
+            args = Arguments({"Alpha": server.url("/alpha.csv"), "Bravo": server.url("/bravo.xlsx"),
+                              "Charlie": f"file://{legacy_path}"})
+
+            futures = prefetch_inputs(args, manifest, prefix=directory)
+            self.assertEqual(set(futures.keys()), {"Alpha", "Bravo", "Charlie"})
+            self.assertEqual(len(list(as_completed(futures.values()))), 3)
+
+            self.assertTrue(futures["Alpha"].result().endswith(".csv"))
+            self.assertTrue(futures["Bravo"].result().endswith(".xlsx"))
+            self.assertEqual(futures["Charlie"].result(), str(legacy_path))
+            for future in futures.values():
+                df = read_input_spreadsheet_data_frame(f"file://{future.result()}")
+                self.assertEqual(list(df.columns), ["hello", "world"])
+
+    def test_write_output_data_frame(self):
+        expected = DataFrame({"id": range(25), "name": [f"näme{i % 7}" for i in range(25)],
+                              "score": [i / 4 if i % 5 else None for i in range(25)]})
+        csv_slot = ToolManifestSlot("Output", "Output Description", ["csv", "xlsx"])
+        xlsx_slot = ToolManifestSlot("Output", "Output Description", ["txt", "xlsx", "csv"])
+        with LocalServer() as server, tempfile.TemporaryDirectory() as directory:
+            for slot, extension in [(csv_slot, "csv"), (xlsx_slot, "xlsx")]:
+                filepath = os.path.join(directory, "output." + extension)
+                write_output_data_frame(f"file://{filepath}", expected, slot=slot, batch_size=10, prefix=directory)
+                write_output_data_frame(server.url("/output." + extension), expected, slot=slot, batch_size=10,
+                                        prefix=directory)
+                assert_frame_equal(read_input_spreadsheet_data_frame(f"file://{filepath}"), expected)
+                assert_frame_equal(read_input_spreadsheet_data_frame(server.url("/output." + extension),
+                                                                     prefix=directory), expected)
+
+            self.assertTrue(Path(directory, "output.xlsx").read_bytes().startswith(b"PK"))
+
+    def test_write_empty_data_frame(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filepath = os.path.join(directory, "output.csv")
+            write_output_data_frame(f"file://{filepath}", DataFrame({"hello": [], "world": []}))
+            self.assertEqual(Path(filepath).read_text(), "hello,world\n")
+
+    def test_compressed_inputs(self):
+        data = (current_path / "spreadsheets" / "with-bom.csv").read_bytes()
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_DEFLATED) as f:
+            f.writestr("data.csv", data)
+        inputs = {"data.csv.gz": gzip.compress(data), "data.csv.bz2": bz2.compress(data),
+                  "data.zip": archive.getvalue(),
+                  "ooxml.xlsx.gz": gzip.compress((current_path / "spreadsheets" / "ooxml.xlsx").read_bytes())}
+        with LocalServer() as server, tempfile.TemporaryDirectory() as directory:
+            cache = InputCache(os.path.join(directory, "cache"))
+            for name, content in inputs.items():
+                Path(directory, name).write_bytes(content)
+                server.files["/" + name] = content
+                for url in [f"file://{directory}/{name}", server.url("/" + name)]:
+                    for df in [read_input_spreadsheet_data_frame(url, prefix=directory),
+                               read_input_spreadsheet_data_frame(url, prefix=directory, cache=cache),
+                               next(iter_input_spreadsheet_chunks(url, prefix=directory))]:
+                        rows = [list(df.columns)] + [list(row) for row in df.itertuples(index=False)]
+                        self.assertEqual(rows, [["hello", "world"], ["alpha", "bravo"]])
+
+                # Raw reads are not decompressed
+                f = io.BytesIO()
+                read_input_file(server.url("/" + name), f)
+                self.assertEqual(f.getvalue(), content)
+
+            # Compressed CSV files are decompressed as they are parsed, and never written to disk
+            self.assertEqual([name for name in os.listdir(directory) if name.endswith(".csv")], [])
+
+    def test_compressed_outputs(self):
+        expected = DataFrame({"id": range(25), "name": [f"näme{i % 7}" for i in range(25)]})
+        slot = ToolManifestSlot("Output", "Output Description", ["csv.gz", "csv"])
+        with LocalServer() as server, tempfile.TemporaryDirectory() as directory:
+            for compression in [None, "bz2", "zip"]:
+                filepath = os.path.join(directory, "output.csv.out")
+                write_output_data_frame(f"file://{filepath}", expected, slot=slot, compression=compression,
+                                        batch_size=10)
+                write_output_data_frame(server.url("/output"), expected, slot=slot, compression=compression,
+                                        batch_size=10)
+                self.assertEqual(detect_compression(Path(filepath).read_bytes()), compression or "gzip")
+                assert_frame_equal(read_input_spreadsheet_data_frame(f"file://{filepath}", prefix=directory),
+                                   expected)
+                assert_frame_equal(read_input_spreadsheet_data_frame(server.url("/output"), prefix=directory),
+                                   expected)
+
+            write_output_data_frame(f"file://{directory}/output.zip", expected, format="xlsx", compression="zip")
+            with zipfile.ZipFile(os.path.join(directory, "output.zip")) as archive:
+                self.assertEqual(archive.namelist(), ["output"])
+
+            with open(os.path.join(directory, "output.csv.out"), "rb") as f:
+                write_output_file(f"file://{directory}/copy.gz", f, slot=slot)
+            self.assertEqual(gzip.decompress(Path(directory, "copy.gz").read_bytes()),
+                             Path(directory, "output.csv.out").read_bytes())
+            with self.assertRaises(ValueError):
+                write_output_file(f"file://{directory}/copy.gz", io.BytesIO(), compression="rar")
+
+    def test_engines(self):
+        cases = [("legacy.xls", "xlrd"), ("legacy.xls", "calamine"), ("ooxml.xlsx", "openpyxl"),
+                 ("ooxml.xlsx", "calamine"), ("with-bom.csv", "c"), ("with-bom.csv", "pyarrow"),
+                 ("without-bom-utf-8.csv", "pyarrow")]
+        for filename, engine in cases:
+            if engine not in _available_engines(os.path.splitext(filename)[1][1:]):
+                continue
+            filepath = current_path / "spreadsheets" / filename
+            for sheet_hint in [None, "with-bom", "foobar"]:
+                df = read_input_spreadsheet_data_frame(f"file://{filepath}", sheet_hint=sheet_hint, engine=engine)
+                rows = [list(df.columns)] + [list(row) for row in df.itertuples(index=False)]
+                self.assertEqual(rows, [["hello", "world"], ["alpha", "bravo"]], f"{filename} {engine}")
+
+    def test_engines_multisheet(self):
+        filepath = current_path / "spreadsheets" / "multisheet.xlsx"
+        self.assertEqual(_xlsx_sheet_names(filepath), (["bravo", "alpha"], "alpha"))
+        for engine in _available_engines("xlsx"):
+            active = read_input_spreadsheet_data_frame(f"file://{filepath}", engine=engine)
+            expected = read_input_spreadsheet_data_frame(f"file://{filepath}", engine="openpyxl")
+            assert_frame_equal(active, expected)
+            df = read_input_spreadsheet_data_frame(f"file://{filepath}", sheet_hint="bravo", engine=engine)
+            self.assertEqual(list(df.iloc[0]), ["alpha", "bravo"])
+
+    def test_parse_options(self):
+        expected = DataFrame({"a": range(10), "b": [f"b{i}" for i in range(10)], "c": [i * 0.5 for i in range(10)]})
+        with tempfile.TemporaryDirectory() as directory:
+            csv_path = os.path.join(directory, "input.csv")
+            expected.to_csv(csv_path, index=False)
+            xlsx_path = os.path.join(directory, "input.xlsx")
+            expected.to_excel(xlsx_path, index=False)
+
+            cases = [(csv_path, engine) for engine in _available_engines("csv")] + \
+                    [(xlsx_path, engine) for engine in _available_engines("xlsx")]
+            for filepath, engine in cases:
+                df = read_input_spreadsheet_data_frame(f"file://{filepath}", engine=engine, usecols=["a", "c"],
+                                                       dtype={"a": "float64"}, nrows=5, skiprows=[1, 2])
+                assert_frame_equal(df, expected[["a", "c"]].iloc[2:7].reset_index(drop=True).astype({"a": "float64"}),
+                                   obj=f"{filepath} {engine}")
+
+            slot = ToolManifestSlot("Input", "Input Description", ["csv"], ["b"])
+            df = read_input_spreadsheet_data_frame(f"file://{csv_path}", slot=slot)
+            self.assertEqual(list(df.columns), ["b"])
+
+    def test_read_all_sheets(self):
+        filepath = current_path / "spreadsheets" / "multisheet.xlsx"
+        expected = {name: read_input_spreadsheet_data_frame(f"file://{filepath}", sheet_hint=name)
+                    for name in ["bravo", "alpha"]}
+        for max_workers in [1, 2]:
+            frames = read_input_spreadsheet_data_frames(f"file://{filepath}", max_workers=max_workers)
+            self.assertEqual(list(frames), ["bravo", "alpha"])
+            for name, df in frames.items():
+                assert_frame_equal(df, expected[name])
+
+        frames = read_input_spreadsheet_data_frames(f"file://{filepath}", sheet_names=["alpha"])
+        self.assertEqual(list(frames), ["alpha"])
+        with self.assertRaises(ValueError):
+            read_input_spreadsheet_data_frames(f"file://{filepath}", sheet_names=["charlie"])
+
+        for filename in ["legacy.xls", "with-bom.csv"]:
+            filepath = current_path / "spreadsheets" / filename
+            frames = read_input_spreadsheet_data_frames(f"file://{filepath}")
+            self.assertEqual(list(frames.values())[0].columns.tolist(), ["hello", "world"])
+        self.assertEqual(list(frames), [None])
+
+    def test_chartsheets(self):
+        filepath = current_path / "spreadsheets" / "chartsheet.xlsx"
+        # The active tab is the chartsheet, which has no data, so the first worksheet stands in.
+        self.assertEqual(_xlsx_sheet_names(filepath), (["bravo", "alpha"], "bravo"))
+        for engine in _available_engines("xlsx"):
+            frames = read_input_spreadsheet_data_frames(f"file://{filepath}", engine=engine)
+            self.assertEqual(list(frames), ["bravo", "alpha"])
+            df = read_input_spreadsheet_data_frame(f"file://{filepath}", engine=engine)
+            self.assertEqual(list(df.columns), ["hello", "world"])
+            df = read_input_spreadsheet_data_frame(f"file://{filepath}", sheet_hint="chart", engine=engine)
+            self.assertEqual(list(df.columns), ["hello", "world"])
+        chunks = list(iter_input_spreadsheet_chunks(f"file://{filepath}"))
+        self.assertEqual(list(chunks[0].columns), ["hello", "world"])
+
+    def test_read_all_sheets_removes_downloads(self):
+        data = (current_path / "spreadsheets" / "multisheet.xlsx").read_bytes()
+        with LocalServer() as server, tempfile.TemporaryDirectory() as directory, \
+                tempfile.TemporaryDirectory() as prefix:
+            server.files["/multisheet.xlsx"] = data
+            server.files["/multisheet.xlsx.gz"] = gzip.compress(data)
+            cache = InputCache(directory)
+            for url in [server.url("/multisheet.xlsx"), server.url("/multisheet.xlsx.gz")]:
+                for cache_option in [None, cache]:
+                    frames = read_input_spreadsheet_data_frames(url, max_workers=2, prefix=prefix, cache=cache_option)
+                    self.assertEqual(list(frames), ["bravo", "alpha"])
+                    self.assertEqual(os.listdir(prefix), [])
+
+            with mock.patch("toolforgeio.io._read_spreadsheet_file_sheets", side_effect=ValueError("boom")):
+                with self.assertRaises(ValueError):
+                    read_input_spreadsheet_data_frames(server.url("/multisheet.xlsx"), prefix=prefix)
+            self.assertEqual(os.listdir(prefix), [])
+
+    def test_spool(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with _Spool(directory, threshold=10) as spool:
+                spool.write(b"hello")
+                self.assertTrue(spool.in_memory)
+                self.assertRaises(io.UnsupportedOperation, spool.fileno)
+                with spool.open() as a, spool.open() as b:
+                    self.assertEqual(a.read(2), b"he")
+                    self.assertEqual(b.read(), b"hello")
+                    self.assertEqual(a.read(), b"llo")
+
+            with _Spool(directory, threshold=10) as spool:
+                spool.write(b"hello")
+                spool.write(b" world")
+                self.assertFalse(spool.in_memory)
+                self.assertEqual(spool.size, 11)
+                with spool.open() as a, spool.open() as b:
+                    self.assertEqual(a.read(), b"hello world")
+                    self.assertEqual(b.read(5), b"hello")
+                self.assertEqual(spool.digest(), sha256(b"hello world").hexdigest())
+            self.assertTrue(spool.file.closed)
+
+            with _Spool(directory, size=11, threshold=10) as spool:
+                self.assertFalse(spool.in_memory)
+                self.assertEqual(spool.open().read(), b"")
+
+            with _Spool(directory, threshold=10, named=True) as spool:
+                spool.write(b"hello")
+                self.assertIsNone(spool.path)
+                spool.write(b" world")
+                spool.flush()
+                self.assertEqual(Path(spool.path).read_bytes(), b"hello world")
+            self.assertEqual(os.listdir(directory), [])
+
+    def test_spooled_downloads(self):
+        spans = []
+        tracing.add_listener(spans.append)
+        self.addCleanup(tracing.remove_listener, spans.append)
+        self.addCleanup(set_resource_profile, None)
+        with LocalServer() as server, tempfile.TemporaryDirectory() as directory:
+            for threshold in [1024 * 1024, 1024]:
+                set_resource_profile(ResourceProfile("test", 1024 ** 3, 2, 1024, 10, threshold, 1024 ** 3))
+                for filename in ["legacy.xls", "ooxml.xlsx", "with-bom.csv"]:
+                    server.files["/" + filename] = (current_path / "spreadsheets" / filename).read_bytes()
+                    for df in [read_input_spreadsheet_data_frame(server.url("/" + filename), prefix=directory,
+                                                                 pipeline=False),
+                               next(iter_input_spreadsheet_chunks(server.url("/" + filename), prefix=directory,
+                                                                  pipeline=False))]:
+                        rows = [list(df.columns)] + [list(row) for row in df.itertuples(index=False)]
+                        self.assertEqual(rows, [["hello", "world"], ["alpha", "bravo"]])
+
+            # Large files were spooled to disk, and their temporary files are gone
+            downloads = [span for span in spans if span.name == "download"]
+            self.assertEqual([span.attributes["in_memory"] for span in downloads],
+                             [True] * 6 + [False, False, False, False, True, True])
+            self.assertEqual(os.listdir(directory), [])
+
+    def test_csv_errors_not_retried(self):
+        pyarrow_parser = mock.Mock()
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch.dict("toolforgeio.io._PARSERS", {("csv", "pyarrow"): pyarrow_parser}):
+            filepath = Path(directory, "input.csv")
+            filepath.write_text("hello,world\nalpha,bravo\nalpha,bravo,charlie,delta\n")
+            with self.assertRaises(ValueError):
+                read_input_spreadsheet_data_frame(f"file://{filepath}")
+        pyarrow_parser.assert_not_called()
+
+    @unittest.skipUnless(importlib.util.find_spec("python_calamine"), "requires python-calamine")
+    def test_engine_fallback(self):
+        from python_calamine import CalamineError
+
+        filepath = current_path / "spreadsheets" / "ooxml.xlsx"
+        with mock.patch("pandas.read_excel", side_effect=[CalamineError("boom"), DataFrame({"a": [1]})]) as m:
+            df = read_input_spreadsheet_data_frame(f"file://{filepath}")
+        self.assertEqual([call.kwargs["engine"] for call in m.call_args_list], ["calamine", "openpyxl"])
+        self.assertEqual(list(df.columns), ["a"])
+
+        # Errors from bad options are not the engine's fault, so no other engine is tried.
+        with mock.patch("pandas.read_excel", wraps=pandas.read_excel) as m:
+            with self.assertRaises(ValueError):
+                read_input_spreadsheet_data_frame(f"file://{filepath}", usecols=["nonexistent"])
+        self.assertEqual([call.kwargs["engine"] for call in m.call_args_list], ["calamine"])
+
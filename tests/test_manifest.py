@@ -1,7 +1,19 @@
+import os
+import tempfile
 import unittest
+from pathlib import Path
 
+from toolforgeio import manifest as manifest_module
 from toolforgeio.manifest import *
 
+MANIFEST = """
+toolforge: 1.0
+container: abcd1234
+type: tool
+environment:
+  size: {size}
+"""
+
 
 class ManifestTests(unittest.TestCase):
     def test_loads(self):
@@ -40,6 +52,8 @@ class ManifestTests(unittest.TestCase):
                   - csv
                   - xls
                   - xlsx
+                columns:
+                  - hello
             outputs:
               - name: Output
                 description: Output Description
@@ -58,9 +72,53 @@ class ManifestTests(unittest.TestCase):
                 [ManifestEnvironmentVariable("VARIABLE", "Variable Description", False, "world")]),
             [ToolManifestParameter("int", "IntParameter", "Int Description", True),
              ToolManifestParameter("float", "FloatParameter", "Float Description", True)],
-            [ToolManifestSlot("Input", "Input Description", ["txt", "csv", "xls", "xlsx"])],
+            [ToolManifestSlot("Input", "Input Description", ["txt", "csv", "xls", "xlsx"], ["hello"])],
             [ToolManifestSlot("Output", "Output Description", ["csv", "xlsx"])]))
 
+    def test_discover(self):
+        """ Manifest.discover() should reload the manifest only when it changes """
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as directory:
+            os.chdir(directory)
+            self.addCleanup(os.chdir, cwd)
+            filepath = Path(directory, "manifest.yml")
+
+            filepath.write_text(MANIFEST.format(size="small"))
+            m = Manifest.discover()
+            self.assertEqual(m.environment.size, "small")
+            self.assertIs(Manifest.discover(), m)
+
+            filepath.write_text(MANIFEST.format(size="large"))
+            os.utime(filepath, ns=(0, 0))
+            self.assertEqual(Manifest.discover().environment.size, "large")
+
+    def test_discover_cache_directory(self):
+        """ Manifest.discover() should share loaded manifests through the cache directory """
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as directory:
+            os.chdir(directory)
+            self.addCleanup(os.chdir, cwd)
+            cache_directory = os.path.join(directory, "cache")
+            Path(directory, "manifest.yml").write_text(MANIFEST.format(size="small"))
+
+            m = Manifest.discover(cache_directory=cache_directory)
+            self.assertEqual(len(os.listdir(cache_directory)), 1)
+            stat = os.stat("manifest.yml")
+            self.assertEqual(manifest_module._load_manifest_file("manifest.yml", stat, cache_directory), m)
+
+    def test_converters(self):
+        """ ToolManifest.converters() should enforce known parameter types """
+        m = ToolManifest(1.0, "abcd1234", ManifestEnvironment("small", [], []),
+                         [ToolManifestParameter("int", "Int", "Int Description", True),
+                          ToolManifestParameter("string", "String", "String Description", None)], [], [])
+        self.assertEqual(m.converters(), {"Int": (int, True), "String": (PARAMETER_CONVERTERS["string"], False)})
+        self.assertIs(m.converters(), m.converters())
+
+        m = ToolManifest(1.0, "abcd1234", ManifestEnvironment("small", [], []),
+                         [ToolManifestParameter("decimal", "Decimal", "Decimal Description", True)], [], [])
+        with self.assertRaises(ValueError):
+            m.converters()
+
 
 if __name__ == '__main__':
     unittest.main()
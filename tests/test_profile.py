@@ -0,0 +1,68 @@
+import io
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from toolforgeio.io import read_input_spreadsheet_data_frame, iter_input_spreadsheet_chunks, read_input_file
+from toolforgeio.profile import PROFILES, DEFAULT_SIZE, ResourceProfile, get_resource_profile, \
+    resource_profile_for_size, set_resource_profile
+
+current_path = Path(os.path.dirname(os.path.realpath(__file__)))
+
+
+class ProfileTests(unittest.TestCase):
+    def setUp(self):
+        set_resource_profile(None)
+        self.addCleanup(set_resource_profile, None)
+
+    def test_resource_profile_for_size(self):
+        self.assertEqual(resource_profile_for_size("large"), PROFILES["large"])
+        self.assertEqual(resource_profile_for_size("enormous"), PROFILES[DEFAULT_SIZE])
+        self.assertEqual(resource_profile_for_size(None), PROFILES[DEFAULT_SIZE])
+        self.assertTrue(PROFILES["small"].fits_in_memory(1024 * 1024))
+        self.assertFalse(PROFILES["small"].fits_in_memory(1024 * 1024 * 1024))
+
+    def test_discover(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as directory:
+            os.chdir(directory)
+            self.addCleanup(os.chdir, cwd)
+            Path(directory, "manifest.yml").write_text("toolforge: 1.0\ntype: tool\nenvironment:\n  size: small\n")
+            self.assertEqual(get_resource_profile(), PROFILES["small"])
+
+    def test_discover_bad_manifest(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as directory:
+            os.chdir(directory)
+            self.addCleanup(os.chdir, cwd)
+            filepath = Path(directory, "input.csv")
+            filepath.write_text("hello,world\nalpha,bravo\n")
+            for manifest in ["toolforge: 1.0\ntype: workflow\n", "toolforge: [1.0\n", "just a string\n"]:
+                set_resource_profile(None)
+                Path(directory, "manifest.yml").write_text(manifest)
+                self.assertEqual(get_resource_profile(), PROFILES[DEFAULT_SIZE])
+                set_resource_profile(None)
+                data = io.BytesIO()
+                read_input_file(f"file://{filepath}", data)
+                self.assertEqual(data.getvalue(), b"hello,world\nalpha,bravo\n")
+
+    def test_chunksize(self):
+        set_resource_profile(ResourceProfile("tiny", 1024 * 1024, 1, 4096, 2, 0, 0))
+        with tempfile.TemporaryDirectory() as directory:
+            filepath = Path(directory, "input.csv")
+            filepath.write_text("a,b\n" + "".join(f"{i},{i}\n" for i in range(5)))
+            chunks = list(iter_input_spreadsheet_chunks(f"file://{filepath}"))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+
+    def test_mmap(self):
+        set_resource_profile(ResourceProfile("tiny", 1024 * 1024, 1, 4096, 1, 0, 1))
+        for filename in ["with-bom.csv", "without-bom-utf-8.csv"]:
+            filepath = current_path / "spreadsheets" / filename
+            df = read_input_spreadsheet_data_frame(f"file://{filepath}")
+            rows = [list(df.columns)] + [list(row) for row in df.itertuples(index=False)]
+            self.assertEqual(rows, [["hello", "world"], ["alpha", "bravo"]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import io
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from tests.server import LocalServer
+from toolforgeio import tracing
+from toolforgeio.io import read_input_file, read_input_spreadsheet_data_frame, write_output_file
+
+current_path = Path(os.path.dirname(os.path.realpath(__file__)))
+
+
+class TracingTests(unittest.TestCase):
+    def setUp(self):
+        self.spans = []
+        tracing.add_listener(self.spans.append)
+        self.addCleanup(tracing.remove_listener, self.spans.append)
+
+    def test_no_listeners(self):
+        tracing.remove_listener(self.spans.append)
+        self.assertFalse(tracing.enabled())
+        with tracing.span("parse", format="csv") as span:
+            span.set("rows", 1)
+        self.assertEqual(self.spans, [])
+
+    def test_span(self):
+        with self.assertRaises(ValueError):
+            with tracing.span("download", url="https://example.com/data.csv?signature=secret") as outer:
+                with tracing.span("parse", bytes=100) as inner:
+                    pass
+                raise ValueError("boom")
+        self.assertEqual(self.spans, [inner, outer])
+        self.assertIs(inner.parent, outer)
+        self.assertEqual(outer.attributes["url"], "https://example.com/data.csv")
+        self.assertEqual(outer.attributes["error"], "ValueError: boom")
+        self.assertGreater(inner.attributes["throughput"], 0)
+        self.assertGreater(inner.attributes["peak_rss"], 0)
+
+    def test_read_spreadsheet(self):
+        filepath = current_path / "spreadsheets" / "with-bom.csv"
+        read_input_spreadsheet_data_frame(f"file://{filepath}", engine="c")
+        self.assertEqual([span.name for span in self.spans], ["decode", "parse", "read_input_spreadsheet_data_frame"])
+        decode, parse, read = self.spans
+        self.assertEqual(decode.attributes["encoding"], "utf-8")
+        self.assertEqual((parse.attributes["format"], parse.attributes["engine"]), ("csv", "c"))
+        self.assertEqual((parse.attributes["rows"], parse.attributes["columns"]), (1, 2))
+        self.assertIs(parse.parent, read)
+
+    def test_http(self):
+        with LocalServer() as server, tempfile.TemporaryDirectory() as directory:
+            server.files["/ooxml.xlsx"] = (current_path / "spreadsheets" / "ooxml.xlsx").read_bytes()
+            read_input_spreadsheet_data_frame(server.url("/ooxml.xlsx"), prefix=directory)
+            download = next(span for span in self.spans if span.name == "download")
+            self.assertEqual(download.attributes["format"], "xlsx")
+            self.assertEqual(download.attributes["bytes"], len(server.files["/ooxml.xlsx"]))
+
+            self.spans.clear()
+            write_output_file(server.url("/data.bin"), io.BytesIO(b"hello world"))
+            read_input_file(server.url("/data.bin"), io.BytesIO())
+            self.assertEqual([(span.name, span.attributes["bytes"]) for span in self.spans],
+                             [("upload", 11), ("download", 11)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from toolforgeio.manifest import ManifestEnvironment, ToolManifest, ToolManifestParameter
+from toolforgeio.worker import run_worker
+
+manifest = ToolManifest(1.0, "abcd1234", ManifestEnvironment("small", [], []),
+                        [ToolManifestParameter("int", "Count", "Count Description", True)], [], [])
+
+
+class WorkerTests(unittest.TestCase):
+    def setUp(self):
+        self.counts = []
+
+    def tool(self, args):
+        print("this goes to stderr")
+        if args.get("Count") < 0:
+            raise ValueError("negative count")
+        self.counts.append(args.get("Count"))
+
+    def test_stream(self):
+        jobs = io.StringIO("\n".join([
+            json.dumps(["tool.py", "--Count", "1"]),
+            json.dumps({"id": "bad", "argv": ["tool.py", "--Count", "-1"]}),
+            json.dumps(["tool.py"]),
+            "not json",
+            "",
+            json.dumps({"id": "good", "argv": ["tool.py", "--Count", "2"]}),
+        ]))
+        output = io.StringIO()
+        failures = run_worker(self.tool, jobs=jobs, manifest=manifest, output=output, warm=False)
+
+        reports = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(failures, 3)
+        self.assertEqual([(report["id"], report["status"]) for report in reports],
+                         [(0, "ok"), ("bad", "error"), (2, "error"), (3, "error"), ("good", "ok")])
+        self.assertEqual(reports[1]["error"], "ValueError: negative count")
+        self.assertEqual(set(reports[0]["timings"]), {"specialize", "run", "total"})
+        self.assertEqual(self.counts, [1, 2])
+
+    def test_spool_directory(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for index in range(3):
+                with open(os.path.join(directory, f"job{index}.json"), "w") as f:
+                    json.dump(["tool.py", "--Count", str(index - 1)], f)
+            output = io.StringIO()
+            failures = run_worker(self.tool, spool_directory=directory, manifest=manifest, output=output, warm=False)
+
+            self.assertEqual(failures, 1)
+            self.assertEqual(self.counts, [0, 1])
+            self.assertEqual(sorted(os.listdir(directory)),
+                             ["job0.result.json", "job1.result.json", "job2.result.json"])
+            with open(os.path.join(directory, "job0.result.json")) as f:
+                self.assertEqual(json.load(f)["status"], "error")
+
+    def test_spool_directory_job_ids(self):
+        with tempfile.TemporaryDirectory() as directory:
+            spool_directory = os.path.join(directory, "spool")
+            os.mkdir(spool_directory)
+            with open(os.path.join(spool_directory, "job.json"), "w") as f:
+                json.dump({"id": "../escaped", "argv": ["tool.py", "--Count", "1"]}, f)
+            run_worker(self.tool, spool_directory=spool_directory, manifest=manifest, output=io.StringIO(),
+                       warm=False)
+
+            self.assertEqual(os.listdir(directory), ["spool"])
+            self.assertEqual(os.listdir(spool_directory), ["job.result.json"])
+            with open(os.path.join(spool_directory, "job.result.json")) as f:
+                self.assertEqual(json.load(f)["id"], "../escaped")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,35 @@
-from .arguments import Arguments
-from .io import read_input_spreadsheet_data_frame, write_output_file, read_input_file
-from .manifest import Manifest
+import importlib
+
+# The public names, and the modules that define them. Modules are imported on first use, so tools
+# that only need Arguments or Manifest do not pay to import pandas and requests.
+_EXPORTS = {
+    "Arguments": "arguments",
+    "FrameCache": "cache",
+    "InputCache": "cache",
+    "compact_data_frame": "frames",
+    "read_input_spreadsheet_data_frame": "io",
+    "read_input_spreadsheet_data_frames": "io",
+    "iter_input_spreadsheet_chunks": "io",
+    "write_output_file": "io",
+    "read_input_file": "io",
+    "prefetch_inputs": "io",
+    "write_output_data_frame": "io",
+    "Manifest": "manifest",
+    "ResourceProfile": "profile",
+    "get_resource_profile": "profile",
+    "set_resource_profile": "profile",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module("." + _EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
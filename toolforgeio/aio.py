@@ -0,0 +1,296 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import Executor
+from functools import partial
+from io import BytesIO
+from os import SEEK_END
+from typing import TYPE_CHECKING, BinaryIO
+
+from . import http
+from . import io
+from .profile import get_resource_profile
+
+if TYPE_CHECKING:
+    import aiohttp
+    from pandas import DataFrame
+
+
+def _is_http(url: str) -> bool:
+    return url.startswith("http://") or url.startswith("https://")
+
+
+def _tell(f: BinaryIO):
+    """
+    Returns the position of the given stream, or None if it cannot seek, e.g., a pipe.
+    """
+    return f.tell() if f.seekable() else None
+
+
+def _remaining_size(f: BinaryIO, position: int) -> int:
+    """
+    Returns the number of bytes in the given seekable stream after the given position.
+    """
+    size = f.seek(0, SEEK_END) - position
+    f.seek(position)
+    return size
+
+
+class Client:
+    """
+    Asynchronous counterparts of the blocking I/O functions, for use in asyncio programs. HTTP
+    bodies are streamed with aiohttp without blocking the event loop, local file I/O runs in the
+    event loop's default thread executor, and spreadsheet parsing runs in the client's executor.
+    Requires aiohttp for http:// and https:// URLs.
+
+    At most max_concurrency operations run at once, and the rest wait their turn. Cancelling an
+    operation closes its connection and removes any partially downloaded file.
+    """
+
+    def __init__(self, max_concurrency: int = None, executor: Executor = None, session: aiohttp.ClientSession = None):
+        """
+        :param max_concurrency: The maximum number of operations to run at once. Defaults to the
+                                number of workers in the resource profile.
+        :param executor: The executor in which to parse spreadsheets. Defaults to the event loop's
+                         default executor. A ProcessPoolExecutor avoids the GIL for parsing, since
+                         only downloaded bytes or paths, and never open files, are sent to it.
+        :param session: An aiohttp session to use. By default, the client creates its own session
+                        on first use and closes it in close.
+        """
+        self.max_concurrency = max_concurrency or get_resource_profile().workers
+        self.executor = executor
+        self.session = session
+        self._owns_session = session is None
+        self._semaphore = None
+
+    async def __aenter__(self) -> Client:
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        """
+        Closes the client's session, if the client created it.
+        """
+        if self._owns_session and self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Semaphores must be created inside the event loop that uses them, at least before 3.10.
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self.session is None:
+            try:
+                import aiohttp
+            except ImportError:
+                raise ImportError("http:// and https:// URLs in toolforgeio.aio require aiohttp") from None
+            self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(sock_connect=http.CONNECT_TIMEOUT,
+                                                                               sock_read=http.READ_TIMEOUT))
+        return self.session
+
+    async def _run(self, function, *args, **kwargs):
+        """
+        Runs a parse in the client's executor. The arguments must be picklable, in case it is a
+        ProcessPoolExecutor.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self.executor, partial(function, *args, **kwargs))
+
+    async def _run_io(self, function, *args, **kwargs):
+        """
+        Runs blocking I/O on the caller's file-like objects in the event loop's default thread
+        executor, since a process would only write to a copy of them.
+        """
+        return await asyncio.get_running_loop().run_in_executor(None, partial(function, *args, **kwargs))
+
+    async def _request(self, method: str, url: str, data: BinaryIO = None) -> aiohttp.ClientResponse:
+        """
+        Sends a request, retrying with exponential backoff on connection errors and on the statuses
+        in http.RETRY_STATUSES, as the blocking session does. Request bodies are rewound before each
+        retry. The caller must release the response.
+        """
+        # Get the session first, since it explains a missing aiohttp.
+        session = self._get_session()
+        import aiohttp
+
+        position = await self._run_io(_tell, data) if data is not None else None
+        retryable = data is None or position is not None
+        headers = None
+        if position is not None:
+            size = await self._run_io(_remaining_size, data, position)
+            headers = {"Content-Length": str(size)}
+        attempt = 0
+        while True:
+            try:
+                # aiohttp closes file bodies once they are sent, so the file is read here instead,
+                # which leaves it open for the caller and for retries.
+                body = self._iter_body(data, position) if data is not None else None
+                response = await session.request(method, url, data=body, headers=headers)
+                if response.status not in http.RETRY_STATUSES or attempt >= http.RETRIES or not retryable:
+                    break
+                response.release()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt >= http.RETRIES or not retryable:
+                    raise
+            await asyncio.sleep(http.BACKOFF_FACTOR * (2 ** attempt))
+            attempt = attempt + 1
+        response.raise_for_status()
+        return response
+
+    async def _iter_body(self, data: BinaryIO, position: int = None):
+        """
+        Yields the content of the given file-like object from the given position, or from its
+        current position if it cannot seek, reading in a thread since reads may block.
+        """
+        if position is not None:
+            await self._run_io(data.seek, position)
+        buffer_size = get_resource_profile().buffer_size
+        while chunk := await self._run_io(data.read, buffer_size):
+            yield chunk
+
+    async def _download(self, url: str, data: BinaryIO) -> bytes:
+        """
+        Streams the body of the given URL into the given file-like object. Writes to in-memory
+        buffers happen inline, and others in a thread, since they may block.
+
+        :return: The first few bytes of the body, from which to detect its type
+        """
+        buffer_size = get_resource_profile().buffer_size
+        async with await self._request("GET", url) as response:
+            prefix = b""
+            async for chunk in response.content.iter_chunked(buffer_size):
+                if len(prefix) < 4096:
+                    prefix = prefix + chunk[:4096 - len(prefix)]
+                if isinstance(data, BytesIO):
+                    data.write(chunk)
+                else:
+                    await self._run_io(data.write, chunk)
+        return prefix
+
+    async def read_input_file(self, url: str, data: BinaryIO):
+        """
+        Download input data from the given URL to the given file-like object
+
+        :param url: The source from which to download the data
+        :param data: The destination to which to write the data
+        """
+        async with self._get_semaphore():
+            if url.startswith("file://"):
+                await self._run_io(io.read_input_file, url, data)
+            elif _is_http(url):
+                await self._download(url, data)
+            else:
+                raise ValueError(f"unrecognized protocol: {url}")
+
+    async def write_output_file(self, url: str, data: BinaryIO):
+        """
+        Uploads output data from the given file-like object to the given URL
+
+        :param url: The destination to which to upload data
+        :param data: The source from which to read the data
+        """
+        async with self._get_semaphore():
+            if url.startswith("file://"):
+                await self._run_io(io.write_output_file, url, data)
+            elif _is_http(url):
+                (await self._request("PUT", url, data)).release()
+            else:
+                raise ValueError(f"unrecognized protocol: {url}")
+
+    async def read_input_spreadsheet_data_frame(self, url: str, prefix="/tmp", sheet_hint=None, engine=None,
+                                                usecols=None, dtype=None, nrows=None, skiprows=None) -> DataFrame:
+        """
+        Downloads a spreadsheet file from the given url and returns a pandas dataframe loaded from
+        the resulting data, as io.read_input_spreadsheet_data_frame does. Parsing happens in the
+        executor.
+
+        :param url: The URL from which to download the spreadsheet
+        :param prefix: A directory in which to place the temporary file for a download too large
+                       to keep in memory. file:// URLs are read in place and not copied.
+        :param sheet_hint: If there are multiple sheets, use the named sheet if it exists
+        :param engine: The engine with which to parse the file, as in ENGINES
+        :param usecols: The columns to load, as in pandas.read_csv
+        :param dtype: The data type of the whole frame or of each named column
+        :param nrows: The maximum number of rows to load, not counting the header
+        :param skiprows: The rows to skip at the start of the file
+        :return: A pandas dataframe containing the data from the spreadsheet
+        """
+        options = io._parse_options(usecols, dtype, nrows, skiprows)
+        async with self._get_semaphore():
+            if url.startswith("file://"):
+                return await self._run(io._read_input_spreadsheet_data_frame, url, prefix, sheet_hint, None, None,
+                                       True, engine, options)
+            elif _is_http(url):
+                spool, extension = await self._spool_download(url, prefix)
+                with spool:
+                    content = spool.contents() if spool.in_memory else spool.path
+                    return await self._run(_parse_download, url, content, extension, prefix, sheet_hint, engine,
+                                           options)
+            else:
+                raise ValueError("Unrecognized url protocol", url)
+
+    async def _spool_download(self, url: str, prefix: str):
+        """
+        Downloads the given URL into a spool, which keeps it in memory unless it is larger than the
+        spool threshold in the resource profile, and otherwise in a named temporary file in the
+        given directory. The spool is closed if the download fails or is cancelled.
+
+        :return: A tuple of the spool and the detected extension of its content
+        """
+        spool = io._Spool(prefix, named=True)
+        try:
+            extension = io._first_chunk_to_extension(await self._download(url, spool))
+            await self._run_io(spool.flush)
+        except BaseException:
+            spool.close()
+            raise
+        return spool, extension
+
+
+def _parse_download(url: str, content, extension: str, prefix: str, sheet_hint, engine, options: dict) -> DataFrame:
+    """
+    Parses a spreadsheet downloaded by a Client, in its executor. The download is passed as its
+    bytes or as the path of its temporary file, so that it can be sent to another process.
+    """
+    if isinstance(content, str):
+        return io._read_input_spreadsheet_data_frame("file://" + content, prefix, sheet_hint, None, None, True, engine,
+                                                     options)
+    spool = io._Spool(prefix, len(content), len(content))
+    spool.write(content)
+    return io._read_spooled_input(url, spool, extension, prefix, sheet_hint, engine, options)
+
+
+async def read_input_file(url: str, data: BinaryIO, client: Client = None):
+    """
+    Asynchronous version of io.read_input_file. Uses a temporary Client if none is given.
+    """
+    if client is None:
+        async with Client() as client:
+            return await client.read_input_file(url, data)
+    return await client.read_input_file(url, data)
+
+
+async def write_output_file(url: str, data: BinaryIO, client: Client = None):
+    """
+    Asynchronous version of io.write_output_file. Uses a temporary Client if none is given.
+    """
+    if client is None:
+        async with Client() as client:
+            return await client.write_output_file(url, data)
+    return await client.write_output_file(url, data)
+
+
+async def read_input_spreadsheet_data_frame(url: str, prefix="/tmp", sheet_hint=None, client: Client = None,
+                                            **kwargs) -> DataFrame:
+    """
+    Asynchronous version of io.read_input_spreadsheet_data_frame. Uses a temporary Client if none
+    is given. Other keyword arguments are as in Client.read_input_spreadsheet_data_frame.
+    """
+    if client is None:
+        async with Client() as client:
+            return await client.read_input_spreadsheet_data_frame(url, prefix, sheet_hint, **kwargs)
+    return await client.read_input_spreadsheet_data_frame(url, prefix, sheet_hint, **kwargs)
@@ -1,7 +1,5 @@
 from __future__ import annotations
 
-from datetime import datetime
-
 from .manifest import Manifest, ToolManifest
 
 
@@ -42,29 +40,19 @@ class Arguments:
 
     def specialize(self, manifest: Manifest) -> Arguments:
         """
-        Convert all parameters into their appropriate types as determined by the manifest.
+        Convert all parameters into their appropriate types as determined by the manifest, and check
+        that all required parameters are given.
 
         :param manifest: The tool's manifest
         :return: A new Arguments instance with specialized values
         """
         if isinstance(manifest, ToolManifest):
             options = self.options.copy()
-            for parameter in manifest.parameters:
-                if parameter.name not in options:
+            for name, (converter, required) in manifest.converters().items():
+                if name not in options:
+                    if required:
+                        raise ValueError(f"missing required parameter {name}")
                     continue
-                value = options[parameter.name]
-                if parameter.type == "int":
-                    value = int(value)
-                elif parameter.type == "float":
-                    value = float(value)
-                elif parameter.type == "boolean":
-                    value = value.lower().startswith("t")
-                elif parameter.type == "string":
-                    pass
-                elif parameter.type == "date":
-                    value = datetime.fromisoformat(value)
-                else:
-                    raise ValueError(f"unrecognized parameter type {parameter.type}")
-                options[parameter.name] = value
+                options[name] = converter(options[name])
             return Arguments(options)
         raise ValueError(f"unrecognized manifest type {manifest.type}")
@@ -0,0 +1,377 @@
+from __future__ import annotations
+
+import importlib.util
+import json
+import os
+from contextlib import contextmanager
+from hashlib import sha256
+from tempfile import NamedTemporaryFile
+from typing import TYPE_CHECKING, Iterator, Optional
+
+if TYPE_CHECKING:
+    import requests
+    from pandas import DataFrame
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    # Not POSIX, so no advisory locks. The cache still works, but it is not safe to share a cache
+    # directory between processes.
+    fcntl = None
+
+from . import http, tracing
+from .io import _copy_input_stream, _file_digest, _response_to_input_stream
+
+
+def _lock(f, exclusive: bool, blocking: bool = True) -> bool:
+    """
+    Takes an advisory lock on the given open file. The lock is released when the file is closed.
+
+    :param f: The open file to lock
+    :param exclusive: Take an exclusive lock if True, or a shared lock otherwise
+    :param blocking: Wait for the lock if True, or give up immediately otherwise
+    :return: True if the lock was taken, or False otherwise
+    """
+    if fcntl is None:
+        return True
+    operation = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+    if not blocking:
+        operation = operation | fcntl.LOCK_NB
+    try:
+        fcntl.flock(f.fileno(), operation)
+        return True
+    except BlockingIOError:
+        return False
+
+
+class CacheEntry:
+    def __init__(self, path: str, digest: str, extension: str):
+        self.path = path
+        self.digest = digest
+        self.extension = extension
+
+    def __repr__(self):
+        return str(self)
+
+    def __str__(self):
+        return f"CacheEntry({self.path}, {self.digest}, {self.extension})"
+
+
+class _DirectoryCache:
+    """
+    The parts common to all caches that store files in a directory with a fixed byte budget. The
+    directory may be shared by many processes.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    @contextmanager
+    def _locked(self):
+        with open(os.path.join(self.directory, ".lock"), "a") as f:
+            _lock(f, exclusive=True)
+            yield
+
+    def _open_locked(self, path: str):
+        """
+        Opens the given cached file and marks it as in use and recently used. Must be called while
+        holding the directory lock.
+
+        :return: The open file, or None if the file has been evicted
+        """
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return None
+        _lock(f, exclusive=False)
+        os.utime(path)
+        return f
+
+    def _evict(self, subdirectory: str):
+        """
+        Removes least recently used files until the cache fits in its budget. Files that are in
+        use by any process are skipped. Must be called while holding the directory lock.
+        """
+        files_path = os.path.join(self.directory, subdirectory)
+        files = []
+        for name in os.listdir(files_path):
+            try:
+                files.append((os.stat(os.path.join(files_path, name)), name))
+            except FileNotFoundError:
+                pass
+
+        total = sum(stat.st_size for stat, name in files)
+        for stat, name in sorted(files, key=lambda file: file[0].st_mtime):
+            if total <= self.max_bytes:
+                break
+            file_path = os.path.join(files_path, name)
+            with open(file_path, "rb") as f:
+                if not _lock(f, exclusive=True, blocking=False):
+                    continue
+                os.remove(file_path)
+            total = total - stat.st_size
+
+
+class InputCache(_DirectoryCache):
+    """
+    A content-addressed cache of downloaded input files with a fixed byte budget.
+
+    Files are stored by the SHA-256 of their content, so the same data downloaded from two URLs is
+    stored once. Each URL remembers the ETag and Last-Modified headers of its last download, and
+    later fetches revalidate with a conditional GET. When the cache grows past its budget, the
+    least recently used files are evicted, along with the metadata of the URLs that they came from.
+
+    The cache directory may be shared by many processes. Metadata updates are serialized with an
+    advisory lock on the directory, and files in use hold a shared lock that prevents eviction.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 1024 * 1024 * 1024):
+        """
+        :param directory: The directory in which to store cached files. Created if needed.
+        :param max_bytes: The maximum total size of cached files
+        """
+        super().__init__(directory, max_bytes)
+        os.makedirs(os.path.join(directory, "blobs"), exist_ok=True)
+        os.makedirs(os.path.join(directory, "refs"), exist_ok=True)
+
+    def _blob_path(self, digest: str, extension: str) -> str:
+        return os.path.join(self.directory, "blobs", digest + "." + extension)
+
+    def _ref_path(self, url: str) -> str:
+        return os.path.join(self.directory, "refs", sha256(url.encode(encoding="utf-8")).hexdigest() + ".json")
+
+    def _read_ref(self, url: str):
+        """
+        Returns the metadata for the given URL, or None if the URL is not cached. Must be called
+        while holding the directory lock.
+        """
+        try:
+            with open(self._ref_path(url), "r") as f:
+                ref = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if ref.get("url") != url or not os.path.isfile(self._blob_path(ref["digest"], ref["extension"])):
+            return None
+        return ref
+
+    def _write_ref(self, url: str, ref: dict):
+        """
+        Atomically replaces the metadata for the given URL. Must be called while holding the
+        directory lock.
+        """
+        with NamedTemporaryFile("w", dir=os.path.join(self.directory, "refs"), delete=False) as f:
+            json.dump(ref, f)
+        os.replace(f.name, self._ref_path(url))
+
+    def _prune_refs(self):
+        """
+        Removes the metadata of URLs whose files have been evicted, so that it does not pile up
+        past the budget. Must be called while holding the directory lock.
+        """
+        blobs = set(os.listdir(os.path.join(self.directory, "blobs")))
+        refs_path = os.path.join(self.directory, "refs")
+        for name in os.listdir(refs_path):
+            if not name.endswith(".json"):
+                continue
+            ref_path = os.path.join(refs_path, name)
+            try:
+                with open(ref_path, "r") as f:
+                    ref = json.load(f)
+                blob_name = ref["digest"] + "." + ref["extension"]
+            except FileNotFoundError:
+                continue
+            except (ValueError, KeyError, TypeError):
+                blob_name = None
+            if blob_name not in blobs:
+                os.remove(ref_path)
+
+    def _download(self, url: str, response: requests.Response):
+        """
+        Downloads the given response body into a temporary file in the cache directory.
+
+        :return: A tuple of the temporary file path, content digest, and file extension
+        """
+        source = _response_to_input_stream(url, response)
+        with NamedTemporaryFile("wb", dir=self.directory, suffix=".part", delete=False) as f:
+            try:
+                _copy_input_stream(source, f)
+            except BaseException:
+                f.close()
+                os.remove(f.name)
+                raise
+        return f.name, _file_digest(f.name), source.extension
+
+    def _open_blob(self, ref: dict):
+        return self._open_locked(self._blob_path(ref["digest"], ref["extension"]))
+
+    def _store(self, url: str, response: requests.Response):
+        """
+        Downloads the given response body into the cache and records it as the latest copy of the
+        given URL.
+
+        :return: A tuple of the open cached file and its metadata
+        """
+        temp_path, digest, extension = self._download(url, response)
+        ref = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "digest": digest,
+            "extension": extension
+        }
+        with self._locked():
+            blob_path = self._blob_path(digest, extension)
+            if os.path.isfile(blob_path):
+                os.remove(temp_path)
+            else:
+                os.replace(temp_path, blob_path)
+            self._write_ref(url, ref)
+            blob = self._open_blob(ref)
+            self._evict("blobs")
+            self._prune_refs()
+        return blob, ref
+
+    @contextmanager
+    def fetch(self, url: str) -> Iterator[CacheEntry]:
+        """
+        Returns the cached copy of the given URL, downloading or revalidating it as needed. The
+        cached file will not be evicted until the block exits.
+
+        :param url: The http:// or https:// URL to fetch
+        :return: A CacheEntry describing the cached file
+        """
+        with tracing.span("fetch", url=url) as span:
+            blob, ref, hit = self._fetch(url)
+            span.set("cache_hit", hit)
+            span.set("format", ref["extension"])
+            span.set("bytes", os.fstat(blob.fileno()).st_size)
+
+        try:
+            yield CacheEntry(blob.name, ref["digest"], ref["extension"])
+        finally:
+            blob.close()
+
+    def _fetch(self, url: str):
+        """
+        Returns the open cached file for the given URL, its metadata, and whether it was a cache hit,
+        as in fetch.
+        """
+        with self._locked():
+            ref = self._read_ref(url)
+
+        blob = None
+        if ref is not None:
+            headers = {}
+            if ref.get("etag"):
+                headers["If-None-Match"] = ref["etag"]
+            if ref.get("last_modified"):
+                headers["If-Modified-Since"] = ref["last_modified"]
+            with http.get(url, headers=headers, stream=True) as response:
+                if response.status_code == 304:
+                    with self._locked():
+                        blob = self._open_blob(ref)
+                    if blob is not None:
+                        self.hits = self.hits + 1
+                        return blob, ref, True
+                else:
+                    response.raise_for_status()
+                    blob, ref = self._store(url, response)
+                    self.misses = self.misses + 1
+
+        if blob is None:
+            # Either we have never seen this URL, or its file was evicted while we revalidated it.
+            with http.get(url, stream=True) as response:
+                response.raise_for_status()
+                blob, ref = self._store(url, response)
+                self.misses = self.misses + 1
+
+        return blob, ref, False
+
+
+class FrameCache(_DirectoryCache):
+    """
+    A cache of parsed spreadsheets stored as uncompressed Feather files with a fixed byte budget.
+
+    Entries are keyed by the hash of the downloaded bytes plus the options used to parse them, so
+    a cached frame is only reused for identical input parsed identically. Cached frames are read
+    by memory-mapping the Feather file, which is far faster than parsing the original spreadsheet
+    again. Frames that Feather cannot represent, e.g., with non-string column names or mixed-type
+    object columns, are simply not cached. Requires pyarrow.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 1024 * 1024 * 1024, enabled: bool = True):
+        """
+        :param directory: The directory in which to store cached frames. Created if needed.
+        :param max_bytes: The maximum total size of cached frames
+        :param enabled: If False, then the cache never returns or stores frames
+        """
+        if importlib.util.find_spec("pyarrow") is None:
+            raise ImportError("FrameCache requires pyarrow")
+        super().__init__(directory, max_bytes)
+        self.enabled = enabled
+        os.makedirs(os.path.join(directory, "frames"), exist_ok=True)
+
+    def _frame_path(self, key: str) -> str:
+        return os.path.join(self.directory, "frames", key + ".feather")
+
+    @staticmethod
+    def key(digest: str, **options) -> str:
+        """
+        Returns the cache key for a spreadsheet with the given content hash parsed with the given
+        options.
+
+        :param digest: The hash of the spreadsheet file content
+        :param options: The options that affect how the spreadsheet is parsed, e.g., sheet_hint
+        :return: The cache key
+        """
+        return sha256(json.dumps([digest, options], sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[DataFrame]:
+        """
+        Returns the cached frame for the given key, or None if there is none.
+        """
+        if not self.enabled:
+            return None
+
+        from pyarrow import feather
+
+        with self._locked():
+            f = self._open_locked(self._frame_path(key))
+        if f is None:
+            self.misses = self.misses + 1
+            return None
+        try:
+            result = feather.read_table(f.name, memory_map=True).to_pandas()
+        finally:
+            f.close()
+        # Arrow stores the NaN in an object column as null, which comes back as None. A fresh parse
+        # gives NaN, so put it back.
+        for index in range(result.shape[1]):
+            column = result.iloc[:, index]
+            if column.dtype == object and column.isna().any():
+                result.isetitem(index, column.where(column.notna(), float("nan")))
+        self.hits = self.hits + 1
+        return result
+
+    def put(self, key: str, df: DataFrame):
+        """
+        Stores the given frame under the given key, if Feather can represent it.
+        """
+        if not self.enabled:
+            return
+
+        with NamedTemporaryFile("wb", dir=self.directory, suffix=".part", delete=False) as f:
+            try:
+                df.to_feather(f, compression="uncompressed")
+            except Exception:
+                # Not every frame survives the trip to Arrow. Those frames just aren't cached.
+                f.close()
+                os.remove(f.name)
+                return
+        with self._locked():
+            os.replace(f.name, self._frame_path(key))
+            os.utime(self._frame_path(key))
+            self._evict("frames")
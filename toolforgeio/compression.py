@@ -0,0 +1,268 @@
+import bz2
+import gzip
+import importlib.util
+import struct
+import zlib
+from io import RawIOBase
+from typing import BinaryIO, Iterable, Iterator, Optional
+from zipfile import ZIP_DEFLATED, ZipFile
+
+GZIP_MAGIC_NUMBER = b"\x1F\x8B"
+
+BZ2_MAGIC_NUMBER = b"BZh"
+
+# The magic numbers of the first block and of the end of the stream, which follow the header
+BZ2_BLOCK_MAGIC_NUMBERS = (b"\x31\x41\x59\x26\x53\x59", b"\x17\x72\x45\x38\x50\x90")
+
+ZSTD_MAGIC_NUMBER = b"\x28\xB5\x2F\xFD"
+
+ZIP_MAGIC_NUMBER = b"\x50\x4B\x03\x04"
+
+# The parts of an Office Open XML package, i.e., an XLSX file, one of which is first in the archive
+OOXML_PARTS = ("[Content_Types].xml", "_rels/", "docProps/", "xl/", "customXml/")
+
+# The supported compressions, and the file extension of each
+EXTENSIONS = {
+    "gzip": "gz",
+    "bz2": "bz2",
+    "zstd": "zst",
+    "zip": "zip",
+}
+
+_COMPRESSIONS_BY_EXTENSION = {
+    "gz": "gzip",
+    "gzip": "gzip",
+    "bz2": "bz2",
+    "zst": "zstd",
+    "zstd": "zstd",
+    "zip": "zip",
+}
+
+BUFFER_SIZE = 1024 * 1024
+
+
+def _zstandard():
+    if importlib.util.find_spec("zstandard") is None:
+        raise ImportError("zstd compression requires the zstandard package")
+    import zstandard
+
+    return zstandard
+
+
+def _read(f: BinaryIO, size: int) -> bytes:
+    """
+    Reads exactly size bytes from the given stream, or fewer only if the stream ends first.
+    """
+    chunks = []
+    while size > 0 and (chunk := f.read(size)):
+        chunks.append(chunk)
+        size = size - len(chunk)
+    return b"".join(chunks)
+
+
+def _zip_entry_header(chunk: bytes) -> Optional[tuple]:
+    """
+    Returns the flags, compression method, compressed size, and name of the first entry of the zip
+    archive that starts with the given bytes, or None if the bytes are too few to tell.
+    """
+    if len(chunk) < 30:
+        return None
+    _, _, flags, method, _, _, _, compressed_size, _, name_length, _ = struct.unpack("<4sHHHHHIIIHH", chunk[:30])
+    if len(chunk) < 30 + name_length:
+        return None
+    # Bit 11 marks names encoded as UTF-8 instead of code page 437.
+    name = chunk[30:30 + name_length].decode("utf-8" if flags & 0x800 else "cp437", errors="replace")
+    return flags, method, compressed_size, name
+
+
+def _is_ooxml(chunk: bytes) -> bool:
+    """
+    Returns True if the zip archive that starts with the given bytes is an Office Open XML package
+    rather than an archive of some other file. Packages are assumed when it is hard to tell.
+    """
+    if b"[Content_Types].xml" in chunk:
+        return True
+    header = _zip_entry_header(chunk)
+    return header is None or header[3].startswith(OOXML_PARTS)
+
+
+def detect_compression(chunk: bytes) -> Optional[str]:
+    """
+    Detects the compression of a file from its first few bytes. Zip archives count as compressed
+    unless they are XLSX files, which are also zip archives.
+
+    :param chunk: The first few bytes of the file, ideally at least a few hundred
+    :return: The compression, as in EXTENSIONS, or None if the file is not compressed
+    """
+    if chunk.startswith(GZIP_MAGIC_NUMBER):
+        return "gzip"
+    elif (chunk.startswith(BZ2_MAGIC_NUMBER) and chunk[3:4].isdigit()
+          and chunk[4:10] in BZ2_BLOCK_MAGIC_NUMBERS):
+        return "bz2"
+    elif chunk.startswith(ZSTD_MAGIC_NUMBER):
+        return "zstd"
+    elif chunk.startswith(ZIP_MAGIC_NUMBER) and not _is_ooxml(chunk):
+        return "zip"
+    return None
+
+
+def compression_for_extension(extension: str) -> Optional[str]:
+    """
+    Returns the compression named by the last part of the given file extension, e.g., gzip for
+    csv.gz, or None if the extension does not name one.
+    """
+    return _COMPRESSIONS_BY_EXTENSION.get(extension.lower().rsplit(".", 1)[-1])
+
+
+class _ZipEntryStream(RawIOBase):
+    """
+    A non-seekable binary stream of the decompressed content of the only entry in a zip archive,
+    read from the start of the archive. Unlike ZipFile, this needs no central directory, so the
+    archive need not be seekable. Reading fails if the archive has another entry.
+    """
+
+    def __init__(self, f: BinaryIO):
+        header = _read(f, 30)
+        if len(header) < 30 or not header.startswith(ZIP_MAGIC_NUMBER):
+            raise ValueError("Unrecognized zip archive")
+        name_length, extra_length = struct.unpack("<HH", header[26:30])
+        flags, method, compressed_size, _ = _zip_entry_header(header + _read(f, name_length))
+        _read(f, extra_length)
+
+        if flags & 0x01:
+            raise ValueError("Encrypted zip archives are not supported")
+        if method == ZIP_DEFLATED:
+            self.decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+            self.remaining = None
+        elif method == 0 and not flags & 0x08 and compressed_size != 0xFFFFFFFF:
+            # Stored entries do not mark their own end, so the size must be in the header.
+            self.decompressor = None
+            self.remaining = compressed_size
+        else:
+            raise ValueError("Unsupported zip compression method", method)
+        self.f = f
+        self.finished = False
+
+    def readable(self) -> bool:
+        return True
+
+    def _finish(self, trailing: bytes):
+        """
+        Checks that no other entry follows the one just read. At most a data descriptor comes
+        between the end of the entry's data and the header of the next entry, if any.
+        """
+        if not self.finished:
+            self.finished = True
+            trailing = trailing + _read(self.f, max(0, 28 - len(trailing)))
+            if ZIP_MAGIC_NUMBER in trailing[:28]:
+                raise ValueError("Zip archives must contain a single file")
+
+    def readinto(self, b) -> int:
+        view = memoryview(b)
+        if not view:
+            return 0
+
+        if self.decompressor is None:
+            data = self.f.read(min(len(view), self.remaining))
+            if not data and self.remaining:
+                raise EOFError("Zip archive ended before the end of its entry")
+            self.remaining = self.remaining - len(data)
+            if not data:
+                self._finish(b"")
+            view[:len(data)] = data
+            return len(data)
+
+        while True:
+            if self.decompressor.eof:
+                self._finish(self.decompressor.unused_data)
+                return 0
+            data = self.decompressor.unconsumed_tail or self.f.read(BUFFER_SIZE)
+            if not data:
+                raise EOFError("Zip archive ended before the end of its entry")
+            result = self.decompressor.decompress(data, len(view))
+            if result:
+                view[:len(result)] = result
+                return len(result)
+
+
+def decompress(f: BinaryIO, compression: str) -> BinaryIO:
+    """
+    Wraps the given binary stream in one that decompresses it as it is read. Nothing is written to
+    disk, and the stream need not be seekable.
+
+    :param f: The compressed binary stream, positioned at its start
+    :param compression: The stream's compression, as in EXTENSIONS
+    :return: A binary stream of the decompressed content
+    """
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=f, mode="rb")
+    elif compression == "bz2":
+        return bz2.BZ2File(f, mode="rb")
+    elif compression == "zstd":
+        return _zstandard().ZstdDecompressor().stream_reader(f, read_across_frames=True)
+    elif compression == "zip":
+        return _ZipEntryStream(f)
+    raise ValueError("Unrecognized compression", compression)
+
+
+class _ChunkSink:
+    """
+    A write-only file-like object that collects what is written to it until it is taken.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, b) -> int:
+        self.chunks.append(bytes(b))
+        return len(b)
+
+    def flush(self):
+        pass
+
+    def take(self) -> bytes:
+        result = b"".join(self.chunks)
+        self.chunks = []
+        return result
+
+
+def _compress_zip(chunks: Iterable[bytes], name: str) -> Iterator[bytes]:
+    sink = _ChunkSink()
+    with ZipFile(sink, "w", compression=ZIP_DEFLATED) as archive:
+        # The size is not known in advance, so allow for entries larger than 4GB.
+        with archive.open(name, "w", force_zip64=True) as entry:
+            for chunk in chunks:
+                entry.write(chunk)
+                if data := sink.take():
+                    yield data
+    if data := sink.take():
+        yield data
+
+
+def compress(chunks: Iterable[bytes], compression: str, name: str = "data") -> Iterator[bytes]:
+    """
+    Compresses the given chunks of data as they are produced, so that the compressed data can be
+    streamed to its destination without holding it all in memory.
+
+    :param chunks: The data to compress
+    :param compression: The compression to use, as in EXTENSIONS
+    :param name: The name of the file inside a zip archive
+    :return: The compressed data, in chunks
+    """
+    if compression == "zip":
+        yield from _compress_zip(chunks, name)
+        return
+
+    if compression == "gzip":
+        # A window of 31 bits writes a gzip header and trailer around the deflate stream.
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    elif compression == "bz2":
+        compressor = bz2.BZ2Compressor()
+    elif compression == "zstd":
+        compressor = _zstandard().ZstdCompressor().compressobj()
+    else:
+        raise ValueError("Unrecognized compression", compression)
+    for chunk in chunks:
+        if data := compressor.compress(chunk):
+            yield data
+    yield compressor.flush()
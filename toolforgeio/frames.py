@@ -0,0 +1,62 @@
+import importlib.util
+
+from pandas import DataFrame, to_numeric
+from pandas.api.types import infer_dtype, is_object_dtype
+
+CATEGORY_RATIO = 0.5
+
+
+def _memory_usage(df: DataFrame) -> int:
+    """
+    Returns the number of bytes used by the given dataframe, including the strings it references.
+    """
+    return int(df.memory_usage(deep=True).sum())
+
+
+def _format_bytes(n: int) -> str:
+    return f"{n / (1024 * 1024):.1f}MB"
+
+
+def compact_data_frame(df: DataFrame, category_ratio: float = CATEGORY_RATIO, downcast_floats: bool = False,
+                       arrow_strings: bool = True, downcast_ints: bool = False) -> DataFrame:
+    """
+    Returns a copy of the given dataframe that uses less memory. Text columns in which values
+    repeat often become categoricals, and other text columns become pyarrow-backed strings if
+    pyarrow is installed. Numeric columns keep their types unless downcasting is requested. The
+    memory used before and after is recorded in the result's attrs under "memory_usage".
+
+    :param df: The dataframe to compact
+    :param category_ratio: Convert a text column to a categorical if at least this fraction of its
+                           values are repeats, i.e., 1 - unique / count. Use 1.0 to never convert.
+    :param downcast_floats: If True, then also downcast float columns to float32 where that keeps
+                            their values. This loses precision in later arithmetic.
+    :param arrow_strings: If True, then store text columns as string[pyarrow] if available
+    :param downcast_ints: If True, then also downcast integer columns to the smallest signed integer
+                          type that holds their values. Later arithmetic on them, e.g., sums,
+                          overflows silently if its results do not fit that type.
+    :return: The compacted dataframe
+    """
+    before = _memory_usage(df)
+    use_arrow_strings = arrow_strings and importlib.util.find_spec("pyarrow") is not None
+
+    result = df.copy(deep=False)
+    # Go by position, since spreadsheets may have duplicate column names.
+    for index in range(len(result.columns)):
+        column = result.iloc[:, index]
+        if downcast_ints and column.dtype.kind in "iu":
+            result.isetitem(index, to_numeric(column, downcast="integer"))
+        elif downcast_floats and column.dtype.kind == "f":
+            result.isetitem(index, to_numeric(column, downcast="float"))
+        elif is_object_dtype(column.dtype) and infer_dtype(column, skipna=True) == "string":
+            count = column.count()
+            if count > 0 and 1 - column.nunique() / count >= category_ratio:
+                result.isetitem(index, column.astype("category"))
+            elif use_arrow_strings:
+                result.isetitem(index, column.astype("string[pyarrow]"))
+
+    after = _memory_usage(result)
+    result.attrs["memory_usage"] = {"before": before, "after": after}
+
+    print(f"Compacted dataframe from {_format_bytes(before)} to {_format_bytes(after)}...")
+
+    return result
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import threading
+from typing import TYPE_CHECKING
+
+# requests takes a while to import, so it is imported when the first session is created.
+if TYPE_CHECKING:
+    import requests
+
+CONNECT_TIMEOUT = 10.0
+
+READ_TIMEOUT = 60.0
+
+RETRIES = 5
+
+BACKOFF_FACTOR = 0.5
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+POOL_SIZE = 16
+
+BLOCK_SIZE = 1024 * 1024
+
+_session = None
+
+_session_lock = threading.Lock()
+
+
+def _new_adapter(**kwargs):
+    """
+    Returns an HTTPAdapter that sends request bodies in BLOCK_SIZE blocks instead of the default
+    16KB.
+    """
+    import urllib3
+    from requests.adapters import HTTPAdapter
+
+    class _Adapter(HTTPAdapter):
+        def init_poolmanager(self, *args, **kwargs):
+            # Only urllib3 2.0 and later accept a block size
+            if int(urllib3.__version__.split(".")[0]) >= 2:
+                kwargs.setdefault("blocksize", BLOCK_SIZE)
+            super().init_poolmanager(*args, **kwargs)
+
+    return _Adapter(**kwargs)
+
+
+def new_session(retries=RETRIES, backoff_factor=BACKOFF_FACTOR, pool_size=POOL_SIZE) -> requests.Session:
+    """
+    Creates a new session with connection pooling and retries on idempotent requests. Failed
+    requests are retried with exponential backoff on connection errors and on the statuses in
+    RETRY_STATUSES. Bodies read from seekable files are rewound before each retry, but bodies that
+    cannot be rewound, such as generators and pipes, would be resent empty, so they must be
+    spooled into a seekable file before they are sent.
+
+    :param retries: The maximum number of times to retry each request
+    :param backoff_factor: The base of the exponential backoff between retries, in seconds
+    :param pool_size: The maximum number of connections to keep open to each host
+    :return: The new session
+    """
+    import requests
+    from urllib3.util.retry import Retry
+
+    retry = Retry(total=retries,
+                  backoff_factor=backoff_factor,
+                  status_forcelist=RETRY_STATUSES,
+                  allowed_methods=["HEAD", "GET", "PUT"],
+                  raise_on_status=False)
+    adapter = _new_adapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """
+    Returns the session shared by all I/O functions, creating it with new_session if needed.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = new_session()
+    return _session
+
+
+def set_session(session: requests.Session):
+    """
+    Replaces the session shared by all I/O functions, e.g., to change retries or add
+    authentication. Passing None resets to a default session on next use.
+    """
+    global _session
+    with _session_lock:
+        _session = session
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    """
+    Sends a GET request using the shared session and the default timeouts.
+    """
+    kwargs.setdefault("timeout", (CONNECT_TIMEOUT, READ_TIMEOUT))
+    return get_session().get(url, **kwargs)
+
+
+def put(url: str, **kwargs) -> requests.Response:
+    """
+    Sends a PUT request using the shared session and the default timeouts.
+    """
+    kwargs.setdefault("timeout", (CONNECT_TIMEOUT, READ_TIMEOUT))
+    return get_session().put(url, **kwargs)
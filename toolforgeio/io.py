@@ -1,13 +1,33 @@
-from hashlib import md5
-from io import TextIOWrapper
-from os import SEEK_SET
-from typing import BinaryIO, TextIO
+from __future__ import annotations
 
-import chardet
-import openpyxl
-import requests
-import xlrd
-from pandas import read_excel, read_csv, DataFrame
+import importlib.util
+import mmap
+import os
+from codecs import getincrementaldecoder
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from hashlib import md5, sha256
+from io import BufferedReader, BytesIO, FileIO, RawIOBase, TextIOWrapper, UnsupportedOperation
+from os import SEEK_CUR, SEEK_END, SEEK_SET
+from stat import S_ISREG
+from tempfile import NamedTemporaryFile, TemporaryFile, mkstemp
+from typing import TYPE_CHECKING, BinaryIO, Iterator, Optional, TextIO
+from xml.etree import ElementTree
+from zipfile import ZipFile
+
+from . import http, tracing
+from .arguments import Arguments
+from .compression import EXTENSIONS as COMPRESSION_EXTENSIONS
+from .compression import BUFFER_SIZE, _read, compress, compression_for_extension, decompress, detect_compression
+from .manifest import ToolManifest, ToolManifestSlot
+from .profile import get_resource_profile
+
+# pandas and the spreadsheet libraries take hundreds of milliseconds to import, so they are
+# imported by the functions that use them instead of here.
+if TYPE_CHECKING:
+    import openpyxl
+    import xlrd
+    from pandas import DataFrame
 
 XLSX_MAGIC_NUMBER = b"\x50\x4B"
 
@@ -18,11 +38,15 @@ def _first_chunk_to_extension(chunk: bytes) -> str:
     """
     Returns the file extension of the file being downloaded based on the first few bytes of the
     file. This is not perfect across all files, but among spreadsheet files, it works just fine.
+    Compressed files get the extension of their compression, e.g., gz, regardless of content.
 
     :param chunk: The first few bytes of the file, at least 2
     :return: The file extension to use when loading the data
     """
-    if chunk.startswith(XLSX_MAGIC_NUMBER):
+    compression = detect_compression(chunk)
+    if compression is not None:
+        return COMPRESSION_EXTENSIONS[compression]
+    elif chunk.startswith(XLSX_MAGIC_NUMBER):
         return "xlsx"
     elif chunk.startswith(XLS_MAGIC_NUMBER):
         return "xls"
@@ -30,157 +54,1630 @@ def _first_chunk_to_extension(chunk: bytes) -> str:
         return "csv"
 
 
-UTF_8_BOM = b"\xEE\xBB\xBF"
+UTF_8_BOM = b"\xEF\xBB\xBF"
 
 UTF_16_BE_BOM = b"\xFE\xFF"
 
 UTF_16_LE_BOM = b"\xFF\xFE"
 
 
-def _decode(f: BinaryIO, default_encoding="utf-8", min_confidence=0.8, errors="ignore") -> TextIO:
+class _PrefixedStream(RawIOBase):
     """
-    Decodes the given binary stream into a text stream while ignoring BOMs and detecting character
-    sets automatically.
+    A non-seekable binary stream that replays bytes already read from another stream, and then
+    continues reading from that stream. This allows peeking at the start of a stream that cannot
+    seek, such as an HTTP response body.
+    """
+
+    def __init__(self, prefix: bytes, f: BinaryIO):
+        self.prefix = memoryview(prefix)
+        self.f = f
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        if self.prefix:
+            n = min(len(b), len(self.prefix))
+            b[:n] = self.prefix[:n]
+            self.prefix = self.prefix[n:]
+            return n
+        return self.f.readinto(b)
+
+    def close(self):
+        super().close()
+        self.f.close()
+
+
+class _MappedStream(RawIOBase):
+    """
+    A binary stream over a memory map. Reads copy straight out of the mapped pages.
+    """
+
+    def __init__(self, mapping: mmap.mmap):
+        self.mapping = mapping
+        self.view = memoryview(mapping)
+        self.position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def seek(self, offset: int, whence: int = SEEK_SET) -> int:
+        if whence == SEEK_SET:
+            self.position = offset
+        elif whence == SEEK_CUR:
+            self.position = self.position + offset
+        else:
+            self.position = len(self.view) + offset
+        return self.position
+
+    def tell(self) -> int:
+        return self.position
+
+    def readinto(self, b) -> int:
+        n = max(0, min(len(b), len(self.view) - self.position))
+        b[:n] = self.view[self.position:self.position + n]
+        self.position = self.position + n
+        return n
+
+    def close(self):
+        if not self.closed:
+            self.view.release()
+            self.mapping.close()
+        super().close()
+
+
+class _Spool:
+    """
+    A download that is kept in memory while it is small, and moved into an anonymous temporary
+    file once it grows past a threshold. Unlike SpooledTemporaryFile, each call to open returns a
+    new and independent binary stream of the content, so that parsers can read it in turn, and a
+    spool on disk is read through a memory map. Closing the spool frees its memory or removes its
+    file, so nothing is left behind.
+    """
+
+    def __init__(self, prefix: str, size: int = None, threshold: int = None, named=False):
+        """
+        :param prefix: A directory in which to place the temporary file, if one is needed
+        :param size: The size of the content, if known. Content larger than the threshold goes
+                     straight to disk.
+        :param threshold: The largest content to keep in memory. Defaults to the spool threshold
+                          in the resource profile.
+        :param named: If True, then the temporary file has a path, so that other processes can
+                      open it. It is still removed when the spool is closed.
+        """
+        self.prefix = prefix
+        self.threshold = get_resource_profile().spool_threshold if threshold is None else threshold
+        self.named = named
+        self.buffer = BytesIO()
+        self.data = None
+        self.file = None
+        self.mapping = None
+        if size is not None and size > self.threshold:
+            self._spill()
+
+    def _spill(self):
+        self.file = NamedTemporaryFile(dir=self.prefix) if self.named else TemporaryFile(dir=self.prefix)
+        with self.buffer.getbuffer() as view:
+            self.file.write(view)
+        self.buffer = None
+
+    @property
+    def in_memory(self) -> bool:
+        return self.file is None
+
+    @property
+    def path(self) -> Optional[str]:
+        """
+        The path of the temporary file, or None if the spool is in memory or its file has no name.
+        """
+        return self.file.name if self.named and self.file is not None else None
+
+    def _target(self) -> BinaryIO:
+        return self.buffer if self.file is None else self.file
+
+    def write(self, b) -> int:
+        if self.file is None and self.buffer.tell() + len(b) > self.threshold:
+            self._spill()
+        return self._target().write(b)
+
+    def fileno(self) -> int:
+        # Only a spool on disk can take parallel ranged downloads.
+        if self.file is None:
+            raise UnsupportedOperation("fileno")
+        return self.file.fileno()
+
+    def flush(self):
+        self._target().flush()
+
+    def seekable(self) -> bool:
+        return True
+
+    def seek(self, offset: int, whence: int = SEEK_SET) -> int:
+        return self._target().seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._target().tell()
+
+    def contents(self):
+        """
+        Returns the whole content, as bytes if the spool is in memory, and as a read-only memory
+        map otherwise. The spool cannot be written after this.
+        """
+        if self.file is None:
+            if self.data is None:
+                # This shares the buffer's memory instead of copying it.
+                self.data = self.buffer.getvalue()
+                self.buffer = None
+            return self.data
+        if self.mapping is None:
+            self.file.flush()
+            if self.file.seek(0, SEEK_END) == 0:
+                return b""
+            self.mapping = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.mapping
+
+    def open(self) -> BinaryIO:
+        """
+        Returns a new binary stream of the whole content.
+        """
+        contents = self.contents()
+        if isinstance(contents, bytes):
+            return BytesIO(contents)
+        return BufferedReader(_MappedStream(mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)))
+
+    @property
+    def size(self) -> int:
+        return len(self.contents())
+
+    def digest(self) -> str:
+        """
+        Returns the SHA-256 of the content as a hex string.
+        """
+        return sha256(self.contents()).hexdigest()
+
+    def close(self):
+        if self.mapping is not None:
+            self.mapping.close()
+            self.mapping = None
+        if self.file is not None:
+            self.file.close()
+        self.buffer = None
+        self.data = None
+
+    def __enter__(self) -> _Spool:
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _local_file(source):
+    """
+    Returns the given spreadsheet, either the path of a local file or a _Spool, as something that
+    pandas and the spreadsheet libraries can open: the path itself, or a new stream of the spool.
+    """
+    return source.open() if isinstance(source, _Spool) else source
+
+
+def _kernel_copy(in_fd: int, out_fd: int, offset: int) -> Optional[int]:
+    """
+    Copies from the given offset of the input file to the end of it into the output file at its
+    current position, entirely within the kernel. Uses copy_file_range, which may share blocks on
+    copy-on-write filesystems, or else sendfile.
+
+    :return: The offset at the end of the input file, or None if the kernel cannot copy between
+             these files, in which case nothing was copied
+    """
+    copies = []
+    if hasattr(os, "copy_file_range"):
+        copies.append(lambda position: os.copy_file_range(in_fd, out_fd, BUFFER_SIZE * 16, position))
+    if hasattr(os, "sendfile"):
+        copies.append(lambda position: os.sendfile(out_fd, in_fd, position, BUFFER_SIZE * 16))
 
-    :param f: The binary stream to decode. Must be seekable.
+    for copy in copies:
+        start = offset
+        try:
+            while n := copy(offset):
+                offset = offset + n
+            return offset
+        except OSError:
+            # e.g., EXDEV across filesystems on older kernels, or an output that is not a regular
+            # file. If we got partway, then the error is real. Otherwise, try something else.
+            if offset != start:
+                raise
+    return None
+
+
+def _is_plain_file(f) -> bool:
+    """
+    Returns True if the given stream is an ordinary file, whose file descriptor holds exactly the
+    data that it reads and writes. A GzipFile, for example, has the descriptor of the compressed
+    file beneath it.
+    """
+    return isinstance(getattr(f, "raw", f), FileIO)
+
+
+def _copy_stream(fin: BinaryIO, fout: BinaryIO):
+    """
+    Copies everything from the given binary stream's current position into the other. If both
+    streams are plain files, then the copy happens in the kernel without passing the data through
+    Python at all. Otherwise, data is read into one reused buffer sized by the resource profile.
+
+    :param fin: The source from which to read the data
+    :param fout: The destination to which to write the data
+    """
+    in_fd = None
+    if _is_plain_file(fin) and _is_plain_file(fout):
+        try:
+            in_fd = fin.fileno()
+            out_fd = fout.fileno()
+            in_stat = os.fstat(in_fd)
+            offset = fin.tell()
+        except (AttributeError, OSError, UnsupportedOperation):
+            in_fd = None
+
+    # Files in /proc and the like claim to be empty regular files. Only the buffered copy works.
+    if in_fd is not None and S_ISREG(in_stat.st_mode) and in_stat.st_size > 0:
+        fout.flush()
+        end = _kernel_copy(in_fd, out_fd, offset)
+        if end is not None:
+            # The kernel moved the output file's position, but not the input file's, and neither
+            # buffered stream knows about it.
+            fin.seek(end, SEEK_SET)
+            if fout.seekable():
+                fout.seek(os.lseek(out_fd, 0, SEEK_CUR), SEEK_SET)
+            return
+
+    buffer_size = get_resource_profile().buffer_size
+    if not hasattr(fin, "readinto"):
+        while chunk := fin.read(buffer_size):
+            fout.write(chunk)
+        return
+
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    while n := fin.readinto(buffer):
+        fout.write(view[:n])
+
+
+ENCODING_SAMPLE_SIZE = 128 * 1024
+
+
+def _detect_encoding(chunk: bytes, default_encoding="utf-8", min_confidence=0.8, truncated=True) -> str:
+    """
+    Detects the character set of the given sample of text. This tries the cheapest checks first:
+
+    1. If the sample is ASCII or valid UTF-8, then it is UTF-8. This settles most real inputs
+       without any statistical analysis, since both checks run in C.
+    2. Otherwise, feed the sample to chardet incrementally and stop as soon as it is confident.
+    3. Otherwise, take chardet's best guess from the whole sample.
+
+    Samples containing NUL bytes skip the first step, since they are likely UTF-16 or UTF-32.
+
+    :param chunk: The sample of text to examine, usually the start of a file
     :param default_encoding: The default encoding to use if there is no confident match
     :param min_confidence: The minimum confidence to accept in detected character set
-    :param errors: How to handle unicode decode errors
-    :return: A
+    :param truncated: True if the sample may end in the middle of a character
+    :return: The name of the detected character set
     """
-    chunk = f.read(3)
+    from chardet.universaldetector import UniversalDetector
+
+    if b"\x00" not in chunk:
+        if chunk.isascii():
+            return "utf-8"
+        try:
+            getincrementaldecoder("utf-8")().decode(chunk, final=not truncated)
+            return "utf-8"
+        except UnicodeDecodeError:
+            pass
+
+    detector = UniversalDetector()
+    for offset in range(0, len(chunk), 8192):
+        detector.feed(chunk[offset:offset + 8192])
+        if detector.done:
+            break
+    detected_encoding = detector.close()
+
+    if detected_encoding["encoding"] is None or detected_encoding["confidence"] < min_confidence:
+        return default_encoding
+    return detected_encoding["encoding"]
+
+
+def _detect_stream_encoding(f: BinaryIO, default_encoding="utf-8", min_confidence=0.8):
+    """
+    Skips any BOM at the start of the given binary stream and detects its character set from the
+    first 128KB using _detect_encoding.
+
+    :param f: The binary stream to examine. If the stream is not seekable, e.g., an HTTP response
+              body, then the bytes read for detection are buffered and replayed.
+    :param default_encoding: The default encoding to use if there is no confident match
+    :param min_confidence: The minimum confidence to accept in detected character set
+    :return: A tuple of a binary stream of the content after the BOM and the detected encoding
+    """
+    chunk = _read(f, 3 + ENCODING_SAMPLE_SIZE)
 
     # BOMs have no bearing on the actual content. For example, Excel's "Export to UTF-8 CSV"
     # function prepends a UTF-16 BE BOM on many machines, including the authors. Ignore.
     detected_bom = b''
     for bom in [UTF_8_BOM, UTF_16_LE_BOM, UTF_16_BE_BOM]:
-        if chunk.startswith(bom):
-            if len(bom) < len(chunk):
-                f.seek(len(bom), SEEK_SET)
+        if chunk.startswith(bom) and len(bom) < len(chunk):
             detected_bom = bom
             break
 
-    chunk = f.read(128 * 1024)
-
-    f.seek(len(detected_bom), SEEK_SET)
+    chunk = chunk[len(detected_bom):]
 
-    detected_encoding = chardet.detect(chunk)
-    if detected_encoding["confidence"] < min_confidence:
-        the_encoding = default_encoding
+    if f.seekable():
+        f.seek(len(detected_bom), SEEK_SET)
     else:
-        the_encoding = detected_encoding["encoding"]
+        f = BufferedReader(_PrefixedStream(chunk, f))
 
+    sample = chunk[:ENCODING_SAMPLE_SIZE]
+    with tracing.span("decode", bytes=len(sample)) as span:
+        the_encoding = _detect_encoding(sample, default_encoding, min_confidence,
+                                        truncated=len(sample) == ENCODING_SAMPLE_SIZE)
+        span.set("encoding", the_encoding)
+
+    return f, the_encoding
+
+
+def _decode(f: BinaryIO, default_encoding="utf-8", min_confidence=0.8, errors="ignore") -> TextIO:
+    """
+    Decodes the given binary stream into a text stream while ignoring BOMs and detecting character
+    sets automatically, as in _detect_stream_encoding.
+
+    :param f: The binary stream to decode. Need not be seekable.
+    :param default_encoding: The default encoding to use if there is no confident match
+    :param min_confidence: The minimum confidence to accept in detected character set
+    :param errors: How to handle unicode decode errors
+    :return: A text stream of the decoded content
+    """
+    f, the_encoding = _detect_stream_encoding(f, default_encoding, min_confidence)
     return TextIOWrapper(f, encoding=the_encoding, errors=errors)
 
 
-def read_input_spreadsheet_data_frame(url: str, prefix="/tmp", sheet_hint=None) -> DataFrame:
+def _choose_xlsx_sheet_name(wb: openpyxl.Workbook, sheet_hint=None) -> str:
+    """
+    Returns the name of the sheet to load from the given XLSX workbook. This is the hinted sheet if
+    it exists, or the active sheet otherwise.
+
+    :param wb: The workbook, which may be opened in read-only mode
+    :param sheet_hint: The name of the preferred sheet, if any
+    :return: The name of the sheet to load
+    """
+    worksheet_names = [ws.title for ws in wb.worksheets]
+    if sheet_hint is not None and sheet_hint in worksheet_names:
+        return sheet_hint
+    # The active sheet may be a chartsheet, which has no data.
+    if wb.active is not None and wb.active.title in worksheet_names:
+        return wb.active.title
+    return worksheet_names[0]
+
+
+def _choose_xls_sheet_name(wb: xlrd.Book, sheet_hint=None) -> str:
+    """
+    Returns the name of the sheet to load from the given XLS workbook. This is the hinted sheet if
+    it exists, or the first visible sheet otherwise. If the workbook was opened on demand, then
+    only the sheets up to and including the first visible sheet are loaded.
+
+    :param wb: The workbook, which may be opened on demand
+    :param sheet_hint: The name of the preferred sheet, if any
+    :return: The name of the sheet to load
+    """
+    sheet_names = wb.sheet_names()
+    if sheet_hint is not None and sheet_hint in sheet_names:
+        return sheet_hint
+    for index, name in enumerate(sheet_names):
+        if wb.sheet_by_index(index).sheet_visible == 1:
+            return name
+    raise ValueError("No visible sheets in workbook")
+
+
+def _xlsx_sheet_names(filepath: str):
+    """
+    Returns the worksheet names and active worksheet name of the given XLSX workbook by reading
+    only the workbook part of the file and its relationships, which are tiny, and none of the
+    sheets. Chartsheets and other sheets without cells are left out.
+
+    :param filepath: The path of the XLSX file, or a binary stream of it
+    :return: A tuple of the list of worksheet names and the name of the active worksheet
+    """
+    with ZipFile(filepath) as archive:
+        workbook_part = "xl/workbook.xml"
+        relationships = ElementTree.fromstring(archive.read("_rels/.rels"))
+        for relationship in relationships:
+            if relationship.get("Type", "").endswith("/officeDocument"):
+                workbook_part = relationship.get("Target").lstrip("/")
+        workbook = ElementTree.fromstring(archive.read(workbook_part))
+        directory, _, name = workbook_part.rpartition("/")
+        try:
+            workbook_relationships = ElementTree.fromstring(archive.read(f"{directory}/_rels/{name}.rels"))
+        except KeyError:
+            workbook_relationships = []
+    sheet_types = {relationship.get("Id"): relationship.get("Type", "").rsplit("/", 1)[-1]
+                   for relationship in workbook_relationships}
+
+    # Find elements and attributes regardless of namespace, since both transitional and strict
+    # schemas exist.
+    sheets = []
+    for e in workbook.iter():
+        if e.tag.rsplit("}", 1)[-1] == "sheet":
+            ids = [value for key, value in e.attrib.items() if key.startswith("{") and key.endswith("}id")]
+            sheets.append((e.get("name"), sheet_types.get(ids[0], "worksheet") if ids else "worksheet"))
+    sheet_names = [name for name, sheet_type in sheets if sheet_type == "worksheet"]
+
+    # This matches openpyxl, which uses the activeTab of the first view that has one. The tab
+    # counts every sheet, and a chartsheet cannot be loaded, so then use the first worksheet.
+    active = 0
+    for e in workbook.iter():
+        if e.tag.rsplit("}", 1)[-1] == "workbookView" and e.get("activeTab") is not None:
+            active = int(e.get("activeTab"))
+            break
+    if not 0 <= active < len(sheets) or sheets[active][1] != "worksheet":
+        return sheet_names, sheet_names[0]
+    return sheet_names, sheets[active][0]
+
+
+def _file_digest(filepath: str) -> str:
+    """
+    Returns the SHA-256 of the given file's content as a hex string.
+    """
+    digest = sha256()
+    buffer = bytearray(BUFFER_SIZE)
+    view = memoryview(buffer)
+    with open(filepath, "rb", buffering=0) as f:
+        while n := f.readinto(buffer):
+            digest.update(view[:n])
+    return digest.hexdigest()
+
+
+def _read_spreadsheet_file(source, extension: str, sheet_hint=None, frame_cache=None,
+                           digest=None, engine=None, options=None) -> DataFrame:
+    """
+    Loads a pandas dataframe from the given local spreadsheet file, going through the given
+    FrameCache if there is one.
+
+    :param source: The path of the spreadsheet file, or a _Spool of its content
+    :param extension: The detected type of the spreadsheet file, i.e., xlsx, xls, or csv
+    :param sheet_hint: If there are multiple sheets, use the named sheet if it exists
+    :param frame_cache: An optional FrameCache in which to look up and store the parsed dataframe
+    :param digest: The SHA-256 of the file's content, if already known
+    :param engine: The engine with which to parse the file, or None to choose automatically
+    :param options: Parse options to pass to pandas, as from _parse_options
+    :return: A pandas dataframe containing the data from the spreadsheet
+    """
+    if frame_cache is None or not frame_cache.enabled:
+        return _parse_spreadsheet_file(source, extension, sheet_hint, engine, options)
+
+    if digest is None:
+        digest = source.digest() if isinstance(source, _Spool) else _file_digest(source)
+    key = frame_cache.key(digest, extension=extension, sheet_hint=sheet_hint,
+                          engine=engine or _available_engines(extension)[0], **(options or {}))
+    with tracing.span("frame_cache", format=extension) as span:
+        result = frame_cache.get(key)
+        span.set("cache_hit", result is not None)
+    if result is None:
+        result = _parse_spreadsheet_file(source, extension, sheet_hint, engine, options)
+        frame_cache.put(key, result)
+    return result
+
+
+def _parse_xlsx_openpyxl(source, sheet_hint=None, **options) -> DataFrame:
+    import openpyxl
+    from pandas import read_excel
+
+    # Open the workbook exactly once, in the same read-only mode that pandas would use, and hand
+    # the open workbook to pandas. Opening in full mode just to find the sheet names parses the
+    # entire file a second time.
+    wb = openpyxl.load_workbook(_local_file(source), read_only=True, data_only=True, keep_links=False)
+    try:
+        chosen_sheet_name = _choose_xlsx_sheet_name(wb, sheet_hint)
+
+        print(f"Found Excel XLSX workbook, processing active sheet {chosen_sheet_name}...")
+
+        return read_excel(wb, sheet_name=chosen_sheet_name, engine="openpyxl", **options)
+    finally:
+        wb.close()
+
+
+def _parse_xlsx_calamine(source, sheet_hint=None, **options) -> DataFrame:
+    from pandas import read_excel
+
+    # Calamine does not know which sheet is active, so read that from the workbook part ourselves.
+    sheet_names, active_sheet_name = _xlsx_sheet_names(_local_file(source))
+    if sheet_hint is not None and sheet_hint in sheet_names:
+        chosen_sheet_name = sheet_hint
+    else:
+        chosen_sheet_name = active_sheet_name
+
+    print(f"Found Excel XLSX workbook, processing active sheet {chosen_sheet_name}...")
+
+    return read_excel(_local_file(source), sheet_name=chosen_sheet_name, engine="calamine", **options)
+
+
+def _open_xls_workbook(source) -> xlrd.Book:
+    """
+    Opens the given XLS workbook, either the path of a local file or a _Spool, on demand.
+    """
+    import xlrd
+
+    if isinstance(source, _Spool):
+        return xlrd.open_workbook(file_contents=source.contents(), on_demand=True)
+    return xlrd.open_workbook(source, on_demand=True)
+
+
+def _parse_xls_xlrd(source, sheet_hint=None, **options) -> DataFrame:
+    from pandas import read_excel
+
+    # Likewise, load the workbook on demand so that only the sheets we look at are parsed.
+    wb = _open_xls_workbook(source)
+    try:
+        chosen_sheet_name = _choose_xls_sheet_name(wb, sheet_hint)
+
+        print(f"Found Excel XLS workbook, processing sheet {chosen_sheet_name}...")
+
+        return read_excel(wb, sheet_name=chosen_sheet_name, engine="xlrd", **options)
+    finally:
+        wb.release_resources()
+
+
+def _parse_xls_calamine(source, sheet_hint=None, **options) -> DataFrame:
+    from pandas import read_excel
+    from python_calamine import CalamineWorkbook, SheetVisibleEnum
+
+    # pandas closes the workbook when it is done with it
+    if isinstance(source, _Spool):
+        wb = CalamineWorkbook.from_object(source.open())
+    else:
+        wb = CalamineWorkbook.from_path(source)
+    if sheet_hint is not None and sheet_hint in wb.sheet_names:
+        chosen_sheet_name = sheet_hint
+    else:
+        chosen_sheet_name = next((sheet.name for sheet in wb.sheets_metadata
+                                  if sheet.visible == SheetVisibleEnum.Visible), None)
+    if chosen_sheet_name is None:
+        wb.close()
+        raise ValueError("No visible sheets in workbook")
+
+    print(f"Found Excel XLS workbook, processing sheet {chosen_sheet_name}...")
+
+    return read_excel(wb, sheet_name=chosen_sheet_name, engine="calamine", **options)
+
+
+def _open_csv_file(source) -> BinaryIO:
+    """
+    Opens the given local CSV file, or _Spool, for parsing. Files at least as large as the mmap
+    threshold in the resource profile are read through a memory map, which avoids a read system
+    call and its copy for each buffer of data.
+    """
+    if isinstance(source, _Spool):
+        return source.open()
+    f = open(source, "rb")
+    size = os.fstat(f.fileno()).st_size
+    if size == 0 or size < get_resource_profile().mmap_threshold:
+        return f
+    try:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    finally:
+        f.close()
+    if hasattr(mapping, "madvise"):
+        mapping.madvise(mmap.MADV_SEQUENTIAL)
+    return BufferedReader(_MappedStream(mapping))
+
+
+def _parse_csv_c(source, sheet_hint=None, **options) -> DataFrame:
+    from pandas import read_csv
+
+    with _decode(_open_csv_file(source)) as f:
+        result = read_csv(f, **options)
+    return result
+
+
+def _pyarrow_supports(options: dict) -> bool:
+    """
+    Returns True if the pyarrow CSV engine supports the given parse options. It does not support
+    row limits, and it treats skiprows differently than the other engines.
+    """
+    usecols = options.get("usecols")
+    return ("nrows" not in options and "skiprows" not in options
+            and (usecols is None or (not callable(usecols) and all(isinstance(c, str) for c in usecols))))
+
+
+def _parse_csv_pyarrow(source, sheet_hint=None, **options) -> DataFrame:
+    from pandas import read_csv
+
+    if not _pyarrow_supports(options):
+        print("The pyarrow engine does not support these options, using engine c...")
+        return _parse_csv_c(source, sheet_hint, **options)
+
+    # pyarrow decodes the text itself, so just tell it the encoding.
+    with (source.open() if isinstance(source, _Spool) else open(source, "rb")) as f:
+        f, the_encoding = _detect_stream_encoding(f)
+        return read_csv(f, engine="pyarrow", encoding=the_encoding, **options)
+
+
+# The engines that may parse each type of spreadsheet, in order of preference. An engine is used
+# only if the package it requires is installed. Reorder these lists to change the default engines.
+ENGINES = {
+    "xlsx": ["calamine", "openpyxl"],
+    "xls": ["calamine", "xlrd"],
+    # The pyarrow engine is multithreaded and much faster on large files, but it infers types
+    # differently than the default C engine, e.g., it parses timestamps. Since that changes the
+    # resulting dataframe, it is only used if requested, or if moved to the front of this list.
+    "csv": ["c", "pyarrow"],
+}
+
+_PARSERS = {
+    ("xlsx", "openpyxl"): _parse_xlsx_openpyxl,
+    ("xlsx", "calamine"): _parse_xlsx_calamine,
+    ("xls", "xlrd"): _parse_xls_xlrd,
+    ("xls", "calamine"): _parse_xls_calamine,
+    ("csv", "c"): _parse_csv_c,
+    ("csv", "pyarrow"): _parse_csv_pyarrow,
+}
+
+_ENGINE_MODULES = {
+    "openpyxl": "openpyxl",
+    "xlrd": "xlrd",
+    "calamine": "python_calamine",
+    "pyarrow": "pyarrow",
+}
+
+
+def _engine_errors(engine: str) -> tuple:
+    """
+    Returns the exception types that mean the given engine itself could not parse a file, e.g.,
+    because its package is broken or the file uses a feature that it does not support, so that the
+    next engine may succeed. Errors that pandas raises for bad options or data, such as ValueError
+    and KeyError, are not among them, since every engine would fail the same way.
+    """
+    errors = (ImportError,)
+    try:
+        if engine == "calamine":
+            from python_calamine import CalamineError
+
+            errors = errors + (CalamineError,)
+        elif engine == "pyarrow":
+            from pyarrow import ArrowNotImplementedError
+
+            errors = errors + (ArrowNotImplementedError,)
+    except ImportError:
+        pass
+    return errors
+
+
+def _available_engines(extension: str) -> list:
+    """
+    Returns the engines that can parse the given type of spreadsheet in this environment, in order
+    of preference.
+    """
+    if extension not in ENGINES:
+        raise ValueError("Unrecognized file extension", extension)
+    return [engine for engine in ENGINES[extension]
+            if engine not in _ENGINE_MODULES or importlib.util.find_spec(_ENGINE_MODULES[engine]) is not None]
+
+
+def _parse_options(usecols=None, dtype=None, nrows=None, skiprows=None) -> dict:
+    """
+    Returns the given parse options as keyword arguments for read_csv and read_excel, leaving out
+    those that are not set so that the pandas defaults apply.
+    """
+    options = {"usecols": usecols, "dtype": dtype, "nrows": nrows, "skiprows": skiprows}
+    return {name: value for name, value in options.items() if value is not None}
+
+
+def _parse_spreadsheet_file(source, extension: str, sheet_hint=None, engine=None,
+                            options=None) -> DataFrame:
+    """
+    Parses a pandas dataframe from the given local spreadsheet file. If no engine is given, then
+    the most preferred available engine in ENGINES is used, and if it fails with one of its own
+    errors, as from _engine_errors, the next, and so on. Other errors are raised at once.
+
+    :param source: The path of the spreadsheet file, or a _Spool of its content
+    :param extension: The detected type of the spreadsheet file, i.e., xlsx, xls, or csv
+    :param sheet_hint: If there are multiple sheets, use the named sheet if it exists
+    :param engine: The engine with which to parse the file, or None to choose automatically
+    :param options: Parse options to pass to pandas, as from _parse_options
+    :return: A pandas dataframe containing the data from the spreadsheet
+    """
+    engines = _available_engines(extension) if engine is None else [engine]
+    for index, candidate in enumerate(engines):
+        parser = _PARSERS.get((extension, candidate))
+        if parser is None:
+            raise ValueError(f"Unrecognized engine {candidate} for file extension {extension}")
+        try:
+            with tracing.span("parse", format=extension, engine=candidate) as span:
+                result = parser(source, sheet_hint, **(options or {}))
+                span.set("rows", result.shape[0])
+                span.set("columns", result.shape[1])
+            return result
+        except Exception as e:
+            if index + 1 == len(engines) or not isinstance(e, _engine_errors(candidate)):
+                raise
+            print(f"Engine {candidate} failed, falling back to engine {engines[index + 1]}...")
+
+
+RANGE_THRESHOLD = 32 * 1024 * 1024
+
+RANGE_PART_SIZE = 8 * 1024 * 1024
+
+
+class _InputStream:
+    """
+    An open input and what we know about it before reading its content.
+    """
+
+    def __init__(self, url: str, stream: BinaryIO, extension: str, size: int = None, accepts_ranges=False,
+                 path: str = None, compression: str = None):
+        """
+        :param url: The URL from which the input was opened
+        :param stream: The binary stream of the input's content, positioned at its start
+        :param extension: The detected extension of the input's content
+        :param size: The size of the input's content in bytes, if known
+        :param accepts_ranges: True if the input can be fetched in parts with HTTP range requests
+        :param path: The path of the input if it is already a local file
+        :param compression: The compression of the input, if the stream decompresses it
+        """
+        self.url = url
+        self.stream = stream
+        self.extension = extension
+        self.size = size
+        self.accepts_ranges = accepts_ranges
+        self.path = path
+        self.compression = compression
+
+
+def _response_to_input_stream(url: str, response) -> _InputStream:
+    """
+    Wraps the given streaming HTTP response as an _InputStream, detecting the type of its content
+    from its first few bytes.
+    """
+    response.raw.decode_content = True
+    chunk = _read(response.raw, 4096)
+
+    # If the body is compressed in transit, then the Content-Length and ranges refer to the
+    # compressed bytes, not the content.
+    size = None
+    accepts_ranges = False
+    if response.headers.get("Content-Encoding", "identity") == "identity":
+        if "Content-Length" in response.headers:
+            size = int(response.headers["Content-Length"])
+        accepts_ranges = response.status_code == 200 and response.headers.get("Accept-Ranges") == "bytes"
+
+    return _InputStream(url, BufferedReader(_PrefixedStream(chunk, response.raw)),
+                        _first_chunk_to_extension(chunk), size, accepts_ranges)
+
+
+def _decompress_input_stream(source: _InputStream) -> _InputStream:
+    """
+    Wraps the given compressed input as an _InputStream of its decompressed content, detecting the
+    type of that content from its first few bytes. The decompressed stream is not seekable, and
+    its size is not known.
+    """
+    compression = compression_for_extension(source.extension)
+    stream = decompress(source.stream, compression)
+    chunk = _read(stream, 4096)
+    return _InputStream(source.url, BufferedReader(_PrefixedStream(chunk, stream)), _first_chunk_to_extension(chunk),
+                        compression=compression)
+
+
+@contextmanager
+def _open_input_stream(url: str, decompress=True) -> Iterator[_InputStream]:
+    """
+    Opens the given URL for reading and detects the type of its content from its first few bytes.
+    The stream is positioned at the start of the content. Streams over http:// and https:// are
+    not seekable, and neither are streams of compressed inputs.
+
+    :param url: The URL from which to read
+    :param decompress: If True, then decompress compressed inputs as they are read. Otherwise,
+                       their extension is that of their compression, e.g., gz.
+    :return: The open input
+    """
+    with _open_raw_input_stream(url) as source:
+        if not decompress or compression_for_extension(source.extension) is None:
+            yield source
+            return
+        source = _decompress_input_stream(source)
+        with source.stream:
+            yield source
+
+
+@contextmanager
+def _open_raw_input_stream(url: str) -> Iterator[_InputStream]:
+    if url.startswith("file://"):
+        with open(url[7:], "rb") as f:
+            extension = _first_chunk_to_extension(f.read(4096))
+            f.seek(0, SEEK_SET)
+            yield _InputStream(url, f, extension, os.fstat(f.fileno()).st_size, path=url[7:])
+    elif url.startswith("http://") or url.startswith("https://"):
+        with http.get(url, stream=True) as response:
+            response.raise_for_status()
+            source = _response_to_input_stream(url, response)
+            with source.stream:
+                yield source
+    else:
+        raise ValueError("Unrecognized url protocol", url)
+
+
+def _download_range(url: str, fd: int, start: int, end: int, base: int = 0, stream: BinaryIO = None):
+    """
+    Downloads the given byte range of the given URL into the same range of the given file.
+
+    :param url: The URL from which to download
+    :param fd: The file descriptor of the destination file
+    :param start: The offset of the first byte to download
+    :param end: The offset after the last byte to download
+    :param base: The offset in the destination file at which the download starts
+    :param stream: If given, a stream already positioned at start from which to read instead
+    """
+    if stream is None:
+        with http.get(url, headers={"Range": f"bytes={start}-{end - 1}"}, stream=True) as response:
+            response.raise_for_status()
+            if response.status_code != 206:
+                raise IOError(f"server ignored range request for {url}")
+            response.raw.decode_content = True
+            return _download_range(url, fd, start, end, base, response.raw)
+
+    buffer = bytearray(min(get_resource_profile().buffer_size, end - start))
+    view = memoryview(buffer)
+    offset = start
+    while offset < end and (n := stream.readinto(view[:min(len(buffer), end - offset)])):
+        os.pwrite(fd, view[:n], base + offset)
+        offset = offset + n
+    if offset != end:
+        raise IOError(f"unexpected end of data downloading bytes {start}-{end - 1} of {url}")
+
+
+def _copy_input_stream(source: _InputStream, fout: BinaryIO):
+    """
+    Copies the whole of the given input into the given file-like object. If the input is a large
+    HTTP download from a server that accepts range requests and the destination is a seekable
+    regular file, then the input is downloaded in parts in parallel, writing each part into place.
+    Otherwise, e.g., for a pipe, the input is copied in a single stream.
+
+    :param source: The input to copy, positioned at its start
+    :param fout: The destination to which to write the data
+    """
+    fd = None
+    if (source.accepts_ranges and source.size is not None and source.size >= RANGE_THRESHOLD
+            and hasattr(os, "pwrite")):
+        try:
+            if fout.seekable() and S_ISREG(os.fstat(fout.fileno()).st_mode):
+                fd = fout.fileno()
+        except (AttributeError, OSError, UnsupportedOperation):
+            fd = None
+
+    if fd is None:
+        _copy_stream(source.stream, fout)
+        return
+
+    fout.flush()
+    base = fout.tell()
+    # Grow the file to hold the whole input, but keep anything already past it.
+    if os.fstat(fd).st_size < base + source.size:
+        os.ftruncate(fd, base + source.size)
+
+    # The first part comes from the response we already have, and the rest from new requests.
+    with ThreadPoolExecutor(max_workers=get_resource_profile().workers) as executor:
+        futures = [executor.submit(_download_range, source.url, fd, 0, min(RANGE_PART_SIZE, source.size), base,
+                                   source.stream)]
+        for start in range(RANGE_PART_SIZE, source.size, RANGE_PART_SIZE):
+            end = min(start + RANGE_PART_SIZE, source.size)
+            futures.append(executor.submit(_download_range, source.url, fd, start, end, base))
+        for future in futures:
+            future.result()
+
+    fout.seek(base + source.size, SEEK_SET)
+
+
+def _download_input_file(url: str, prefix: str):
+    """
+    Downloads the given URL into a file in the given directory, named for the detected type of its
+    content.
+
+    :param url: The URL from which to download the file
+    :param prefix: A directory into which to place the downloaded file
+    :return: A tuple of the downloaded file's path and its detected extension
+    """
+    with _open_input_stream(url) as source:
+        return _save_input_stream(source, prefix)
+
+
+def _save_input_stream(source: _InputStream, prefix: str):
+    """
+    Saves the given input, as from _open_input_stream, into a file in the given directory, named
+    for the detected type of its content. Inputs that are already local files are used in place.
+
+    :param source: The open input
+    :param prefix: A directory into which to place the downloaded file
+    :return: A tuple of the downloaded file's path and its detected extension
+    """
+
+    if source.path is not None:
+        return source.path, source.extension
+
+    # It turns out that the extension of the file when opened is significant,
+    # so to avoid the file copy we generate a filename only the fly as we
+    # download to reflect the expected file type.
+
+    filename = md5(source.url.encode(encoding="utf-8")).hexdigest()
+
+    filepath = prefix + "/" + filename + "." + source.extension
+    with tracing.span("download", url=source.url, format=source.extension, compression=source.compression) as span:
+        with open(filepath, "wb") as fout:
+            _copy_input_stream(source, fout)
+            span.set("bytes", fout.tell())
+
+    return filepath, source.extension
+
+
+def _download_temporary_file(url: str, prefix: str):
+    """
+    Downloads the given URL into a new temporary file in the given directory, named for the
+    detected type of its content, for parsers in other processes that need a path. Inputs that are
+    already local files are used in place.
+
+    :param url: The URL from which to download the file
+    :param prefix: A directory into which to place the downloaded file
+    :return: A tuple of the file's path, its detected extension, and whether the caller must remove
+             the file when done with it
+    """
+    with _open_input_stream(url) as source:
+        if source.path is not None:
+            return source.path, source.extension, False
+        fd, filepath = mkstemp(suffix="." + source.extension, dir=prefix)
+        try:
+            with tracing.span("download", url=source.url, format=source.extension,
+                              compression=source.compression) as span:
+                with open(fd, "wb") as fout:
+                    _copy_input_stream(source, fout)
+                    span.set("bytes", fout.tell())
+        except BaseException:
+            os.remove(filepath)
+            raise
+        return filepath, source.extension, True
+
+
+def _spool_input_stream(source: _InputStream, prefix: str) -> _Spool:
+    """
+    Downloads the given input, as from _open_input_stream, into a _Spool. The input is kept in
+    memory if it is no larger than the spool threshold in the resource profile, and is otherwise
+    written to an anonymous temporary file in the given directory. The caller must close the spool.
+
+    :param source: The open input
+    :param prefix: A directory in which to place the temporary file, if one is needed
+    :return: The spool of the input's content
+    """
+    threshold = get_resource_profile().spool_threshold
+    if source.accepts_ranges:
+        # Inputs large enough to download in parallel ranges go to disk, where each range is
+        # written into place.
+        threshold = min(threshold, RANGE_THRESHOLD - 1)
+    spool = _Spool(prefix, source.size, threshold)
+    try:
+        with tracing.span("download", url=source.url, format=source.extension, compression=source.compression) as span:
+            _copy_input_stream(source, spool)
+            span.set("bytes", spool.tell())
+            span.set("in_memory", spool.in_memory)
+    except BaseException:
+        spool.close()
+        raise
+    return spool
+
+
+def _read_spooled_input(url: str, spool: _Spool, extension: str, prefix: str, sheet_hint=None, engine=None,
+                        options=None) -> DataFrame:
+    """
+    Parses a pandas dataframe from the given spool of an input exactly as downloaded, and closes the
+    spool. Compressed inputs are decompressed into a second spool first.
+
+    :param url: The URL from which the input was downloaded
+    :param spool: The spool of the input's content
+    :param extension: The detected type of the input's content, as from _first_chunk_to_extension
+    :param prefix: A directory in which to place temporary files, if any are needed
+    :return: A pandas dataframe containing the data from the spreadsheet
+    """
+    with spool:
+        if compression_for_extension(extension) is None:
+            return _read_spreadsheet_file(spool, extension, sheet_hint, engine=engine, options=options)
+        with spool.open() as f:
+            source = _decompress_input_stream(_InputStream(url, f, extension))
+            with source.stream, _spool_input_stream(source, prefix) as decompressed:
+                return _read_spreadsheet_file(decompressed, source.extension, sheet_hint, engine=engine,
+                                              options=options)
+
+
+def read_input_spreadsheet_data_frame(url: str, prefix="/tmp", sheet_hint=None, cache=None,
+                                      frame_cache=None, pipeline=True, engine=None, usecols=None, dtype=None,
+                                      nrows=None, skiprows=None, slot: ToolManifestSlot = None,
+                                      compact=False) -> DataFrame:
     """
     Downloads a spreadsheet file from the given url and returns a pandas dataframe loaded from the
     resulting data. The type of the spreadsheet is detected automatically, and may be either CSV,
     XLS, or XLSX. If the downloaded spreadsheet contains more than one sheet, then the active sheet
     -- or the sheet that shows on file open -- is returned.
 
+    Downloads no larger than the spool threshold in the resource profile are kept in memory and
+    parsed from there. Larger downloads are written to an anonymous temporary file, which is
+    removed as soon as the dataframe is parsed.
+
     :param url: The URL from which to download the spreadsheet
-    :param prefix: A directory into which to place the downloaded file
+    :param prefix: A directory in which to place the temporary file for a large download. file://
+                   URLs are read in place and not copied.
     :param sheet_hint: If there are multiple sheets, use the named sheet if it exists
+    :param cache: An optional InputCache through which to download http:// and https:// URLs
+    :param frame_cache: An optional FrameCache in which to look up and store the parsed dataframe
+    :param pipeline: If True and the URL is an http:// or https:// CSV file that is not cached,
+                     then parse the data as it downloads instead of downloading to a file first.
+                     This always uses the default C engine.
+    :param engine: The engine with which to parse the file, e.g., calamine. By default, the most
+                   preferred available engine in ENGINES for the type of the file is used.
+    :param usecols: The columns to load, as in pandas.read_csv. Other columns are never built.
+                    Defaults to the columns declared by the given slot, if any.
+    :param dtype: The data type of the whole frame or of each named column, as in pandas.read_csv
+    :param nrows: The maximum number of rows to load, not counting the header
+    :param skiprows: The rows to skip at the start of the file, as in pandas.read_csv
+    :param slot: The manifest slot from which the URL came, used to choose the columns to load
+    :param compact: If True, then shrink the dataframe with compact_data_frame before returning it
     :return: A pandas dataframe containing the data from the spreadsheet
     """
+    if usecols is None and slot is not None:
+        usecols = slot.columns
+    options = _parse_options(usecols, dtype, nrows, skiprows)
 
-    # It turns out that the extension of the file when opened is significant,
-    # so to avoid the file copy we generate a filename only the fly as we
-    # download to reflect the expected file type.
+    with tracing.span("read_input_spreadsheet_data_frame", url=url):
+        result = _read_input_spreadsheet_data_frame(url, prefix, sheet_hint, cache, frame_cache, pipeline, engine,
+                                                    options)
+    if compact:
+        from .frames import compact_data_frame
 
-    filename = md5(url.encode(encoding="utf-8")).hexdigest()
+        result = compact_data_frame(result)
+    return result
 
-    if url.startswith("file://"):
-        with open(url[7:], "rb") as fin:
-            chunk = fin.read(4096)
-            extension = _first_chunk_to_extension(chunk)
-            filepath = prefix + "/" + filename + "." + extension
-            with open(filepath, "wb") as fout:
-                fout.write(chunk)
-                while chunk := fin.read(4096):
-                    fout.write(chunk)
-    elif url.startswith("http://") or url.startswith("https://"):
-        with requests.get(url, stream=True) as fin:
-            iterator = fin.iter_content(4096)
-            chunk = next(iterator)
-            extension = _first_chunk_to_extension(chunk)
-            filepath = prefix + "/" + filename + "." + extension
-            with open(filepath, "wb") as fout:
-                fout.write(chunk)
-                for chunk in iterator:
-                    fout.write(chunk)
+
+def _read_input_spreadsheet_data_frame(url: str, prefix: str, sheet_hint, cache, frame_cache, pipeline: bool,
+                                       engine, options: dict) -> DataFrame:
+    from pandas import read_csv
+
+    if cache is not None and (url.startswith("http://") or url.startswith("https://")):
+        with cache.fetch(url) as entry:
+            if compression_for_extension(entry.extension) is None:
+                return _read_spreadsheet_file(entry.path, entry.extension, sheet_hint, frame_cache, entry.digest,
+                                              engine, options)
+            # Compressed inputs are cached as they were sent, and decompressed as they are read.
+            return _read_input_spreadsheet_data_frame("file://" + entry.path, prefix, sheet_hint, None, frame_cache,
+                                                      pipeline, engine, options)
+
+    with _open_input_stream(url) as source:
+        profile = get_resource_profile()
+        if source.size is not None and not profile.fits_in_memory(source.size):
+            print(f"Input of {source.size} bytes may not fit in the memory of a {profile.name} environment, "
+                  f"consider iter_input_spreadsheet_chunks...")
+        if (pipeline and source.extension == "csv" and frame_cache is None and engine in (None, "c")
+                and not source.stream.seekable()):
+            # The download happens during the parse, so they are one span.
+            with tracing.span("parse", url=url, format="csv", engine="c", bytes=source.size,
+                              compression=source.compression) as span:
+                with _decode(source.stream) as f:
+                    result = read_csv(f, **options)
+                span.set("rows", result.shape[0])
+                span.set("columns", result.shape[1])
+            return result
+        if source.path is not None:
+            return _read_spreadsheet_file(source.path, source.extension, sheet_hint, frame_cache, engine=engine,
+                                          options=options)
+        spool = _spool_input_stream(source, prefix)
+
+    # The download is closed before parsing starts, and the spool as soon as parsing ends.
+    with spool:
+        return _read_spreadsheet_file(spool, source.extension, sheet_hint, frame_cache, engine=engine,
+                                      options=options)
+
+
+def _spreadsheet_sheet_names(filepath: str, extension: str) -> list:
+    """
+    Returns the names of all sheets in the given local spreadsheet file, in workbook order. CSV
+    files have a single sheet named None.
+    """
+    if extension == "xlsx":
+        sheet_names, active_sheet_name = _xlsx_sheet_names(filepath)
+        return sheet_names
+    elif extension == "xls":
+        import xlrd
+
+        wb = xlrd.open_workbook(filepath, on_demand=True)
+        try:
+            return wb.sheet_names()
+        finally:
+            wb.release_resources()
+    elif extension == "csv":
+        return [None]
     else:
-        raise ValueError("Unrecognized url protocol", url)
+        raise ValueError("Unrecognized file extension", extension)
+
+
+def _read_spreadsheet_file_sheets(filepath: str, extension: str, sheet_names=None, max_workers=None, engine=None,
+                                  options=None) -> dict:
+    """
+    Parses the given sheets of the given local spreadsheet file, in parallel across processes.
+    """
+    all_sheet_names = _spreadsheet_sheet_names(filepath, extension)
+    if sheet_names is None or extension == "csv":
+        sheet_names = all_sheet_names
+    else:
+        missing = [name for name in sheet_names if name not in all_sheet_names]
+        if missing:
+            raise ValueError("No such sheets in workbook", missing)
+
+    if max_workers is None:
+        max_workers = min(get_resource_profile().workers, os.cpu_count() or 1)
+    max_workers = max(1, min(max_workers, len(sheet_names)))
+
+    if max_workers == 1:
+        return {name: _parse_spreadsheet_file(filepath, extension, name, engine, options) for name in sheet_names}
+
+    # Parsing is CPU-bound and holds the GIL, so each sheet is parsed in its own process.
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {name: executor.submit(_parse_spreadsheet_file, filepath, extension, name, engine, options)
+                   for name in sheet_names}
+        return {name: future.result() for name, future in futures.items()}
+
+
+def read_input_spreadsheet_data_frames(url: str, sheet_names=None, max_workers=None, prefix="/tmp", cache=None,
+                                       engine=None, usecols=None, dtype=None, nrows=None, skiprows=None) -> dict:
+    """
+    Downloads a spreadsheet file from the given url once and returns a pandas dataframe for each of
+    its sheets. Sheets are parsed in parallel in separate processes. CSV files have a single sheet,
+    which is returned under the name None.
+
+    :param url: The URL from which to download the spreadsheet
+    :param sheet_names: The names of the sheets to load, or None to load all sheets. Naming a sheet
+                        that does not exist is an error.
+    :param max_workers: The maximum number of processes in which to parse sheets. Defaults to the
+                        number of workers in the resource profile, up to the number of CPUs.
+    :param prefix: A directory in which to place the temporary file for a download, which is
+                   removed once the sheets are parsed. file:// URLs are read in place and not
+                   copied.
+    :param cache: An optional InputCache through which to download http:// and https:// URLs
+    :param engine: The engine with which to parse the file, as in read_input_spreadsheet_data_frame
+    :param usecols: The columns to load from each sheet, as in pandas.read_csv
+    :param dtype: The data type of the whole frame or of each named column, as in pandas.read_csv
+    :param nrows: The maximum number of rows to load from each sheet, not counting the header
+    :param skiprows: The rows to skip at the start of each sheet, as in pandas.read_csv
+    :return: A dict from sheet name to a pandas dataframe containing the data from that sheet, in
+             workbook order
+    """
+    options = _parse_options(usecols, dtype, nrows, skiprows)
+
+    if cache is not None and (url.startswith("http://") or url.startswith("https://")):
+        with cache.fetch(url) as entry:
+            if compression_for_extension(entry.extension) is None:
+                return _read_spreadsheet_file_sheets(entry.path, entry.extension, sheet_names, max_workers, engine,
+                                                     options)
+            # Compressed inputs are cached as they were sent, and decompressed as they are read.
+            filepath, extension, temporary = _download_temporary_file("file://" + entry.path, prefix)
+    else:
+        filepath, extension, temporary = _download_temporary_file(url, prefix)
+    try:
+        return _read_spreadsheet_file_sheets(filepath, extension, sheet_names, max_workers, engine, options)
+    finally:
+        if temporary:
+            os.remove(filepath)
+
+
+def _iter_row_chunks(rows, chunksize: int) -> Iterator[DataFrame]:
+    """
+    Yields dataframes of at most chunksize rows each from the given row iterator, whose cells are
+    converted as from _xlsx_cell_value or _xls_cell_value. The first row is the header. Blank rows
+    are skipped, and rows are padded or truncated to the header's width. Each chunk goes through
+    pandas' own parser for spreadsheet rows, as read_excel does, so that column names, missing
+    values, and types come out the same, and chunks are numbered on from each other, as read_csv
+    chunks are. A sheet with only a header yields one empty dataframe.
+    """
+    from pandas import RangeIndex
+    from pandas.io.parsers import TextParser
+
+    header = next(rows, None)
+    if header is None:
+        return
+    header = list(header)
+    width = len(header)
+
+    def parse(batch: list, start: int) -> DataFrame:
+        result = TextParser([header] + batch, header=0).read()
+        result.index = RangeIndex(start, start + len(result))
+        return result
+
+    batch = []
+    start = 0
+    for row in rows:
+        if all(value == "" for value in row):
+            continue
+        row = list(row[:width])
+        if len(row) < width:
+            row.extend([""] * (width - len(row)))
+        batch.append(row)
+        if len(batch) >= chunksize:
+            yield parse(batch, start)
+            start = start + len(batch)
+            batch = []
+    if batch or start == 0:
+        yield parse(batch, start)
+
+
+def _xlsx_cell_value(value):
+    """
+    Converts the given openpyxl cell value to a python value the same way that pandas does.
+    """
+    if value is None:
+        return ""
+    elif isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _xls_cell_value(cell, datemode: int):
+    """
+    Converts the given xlrd cell to a python value the same way that pandas does.
+    """
+    import xlrd
+    from xlrd.xldate import xldate_as_datetime
+
+    if cell.ctype == xlrd.XL_CELL_DATE:
+        return xldate_as_datetime(cell.value, datemode)
+    elif cell.ctype == xlrd.XL_CELL_BOOLEAN:
+        return bool(cell.value)
+    elif cell.ctype == xlrd.XL_CELL_NUMBER and cell.value == int(cell.value):
+        return int(cell.value)
+    elif cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK):
+        return ""
+    elif cell.ctype == xlrd.XL_CELL_ERROR:
+        return float("nan")
+    return cell.value
+
+
+def _iter_spreadsheet_file_chunks(source, extension: str, chunksize: int,
+                                  sheet_hint=None) -> Iterator[DataFrame]:
+    """
+    Yields dataframes of at most chunksize rows each from the given local spreadsheet file, or
+    _Spool. Sheets are chosen exactly as in _parse_spreadsheet_file.
+    """
+    import openpyxl
+    from pandas import read_csv
 
     if extension == "xlsx":
-        wb = openpyxl.load_workbook(filepath)
+        wb = openpyxl.load_workbook(_local_file(source), read_only=True, data_only=True, keep_links=False)
+        try:
+            chosen_sheet_name = _choose_xlsx_sheet_name(wb, sheet_hint)
 
-        chosen_sheet_name = None
-        if chosen_sheet_name is None:
-            if sheet_hint is not None and sheet_hint in wb.sheetnames:
-                chosen_sheet_name = sheet_hint
-        if chosen_sheet_name is None:
-            chosen_sheet_name = wb.active.title
+            print(f"Found Excel XLSX workbook, processing active sheet {chosen_sheet_name}...")
 
-        print(f"Found Excel XLSX workbook, processing active sheet {chosen_sheet_name}...")
-        
-        return read_excel(filepath, sheet_name=chosen_sheet_name)
+            rows = ([_xlsx_cell_value(value) for value in row]
+                    for row in wb[chosen_sheet_name].iter_rows(values_only=True))
+            yield from _iter_row_chunks(rows, chunksize)
+        finally:
+            wb.close()
     elif extension == "xls":
-        wb = xlrd.open_workbook(filepath)
+        # The XLS format does not allow reading rows incrementally, so xlrd loads the whole sheet.
+        # However, XLS sheets are limited to 65,536 rows, so the sheet is bounded in size anyway.
+        wb = _open_xls_workbook(source)
+        try:
+            chosen_sheet_name = _choose_xls_sheet_name(wb, sheet_hint)
 
-        chosen_sheet_name = None
-        if chosen_sheet_name is None:
-            if sheet_hint is not None:
-                chosen_sheet_name = next(iter([s.name for s in wb.sheets() if s.name == sheet_hint]), None)
-        if chosen_sheet_name is None:
-            chosen_sheet_name = [s.name for s in wb.sheets() if s.sheet_visible == 1][0]
+            print(f"Found Excel XLS workbook, processing sheet {chosen_sheet_name}...")
 
-        print(f"Found Excel XLS workbook, processing sheet {chosen_sheet_name}...")
-
-        return read_excel(filepath, sheet_name=chosen_sheet_name)
+            sheet = wb.sheet_by_name(chosen_sheet_name)
+            rows = ([_xls_cell_value(cell, wb.datemode) for cell in sheet.row(index)]
+                    for index in range(sheet.nrows))
+            yield from _iter_row_chunks(rows, chunksize)
+        finally:
+            wb.release_resources()
     elif extension == "csv":
-        with _decode(open(filepath, "rb")) as f:
-            result = read_csv(f)
-        return result
+        with _decode(_open_csv_file(source)) as f:
+            with read_csv(f, chunksize=chunksize) as reader:
+                yield from reader
     else:
         raise ValueError("Unrecognized file extension", extension)
 
 
-def read_input_file(url, data: BinaryIO):
+def iter_input_spreadsheet_chunks(url: str, chunksize: int = None, prefix="/tmp", sheet_hint=None,
+                                  cache=None, pipeline=True) -> Iterator[DataFrame]:
+    """
+    Downloads a spreadsheet file from the given url and yields pandas dataframes of at most
+    chunksize rows each loaded from the resulting data. Only one chunk is held in memory at a
+    time, so this is suitable for inputs too large to load at once. The type of the spreadsheet
+    and the sheet to load are chosen exactly as in read_input_spreadsheet_data_frame.
+
+    :param url: The URL from which to download the spreadsheet
+    :param chunksize: The maximum number of rows in each dataframe. Defaults to the chunk size in
+                      the resource profile.
+    :param prefix: A directory in which to place the temporary file for a download too large to
+                   keep in memory, as in read_input_spreadsheet_data_frame. file:// URLs are read
+                   in place and not copied.
+    :param sheet_hint: If there are multiple sheets, use the named sheet if it exists
+    :param cache: An optional InputCache through which to download http:// and https:// URLs
+    :param pipeline: If True and the URL is an http:// or https:// CSV file that is not cached,
+                     then parse the data as it downloads instead of downloading to a file first
+    :return: An iterator of pandas dataframes containing the data from the spreadsheet
+    """
+    from pandas import read_csv
+
+    chunksize = chunksize or get_resource_profile().chunksize
+
+    if cache is not None and (url.startswith("http://") or url.startswith("https://")):
+        with cache.fetch(url) as entry:
+            if compression_for_extension(entry.extension) is None:
+                yield from _iter_spreadsheet_file_chunks(entry.path, entry.extension, chunksize, sheet_hint)
+            else:
+                yield from iter_input_spreadsheet_chunks("file://" + entry.path, chunksize, prefix, sheet_hint, None,
+                                                         pipeline)
+        return
+
+    with _open_input_stream(url) as source:
+        if pipeline and source.extension == "csv" and not source.stream.seekable():
+            with _decode(source.stream) as f:
+                with read_csv(f, chunksize=chunksize) as reader:
+                    yield from reader
+            return
+        if source.path is not None:
+            yield from _iter_spreadsheet_file_chunks(source.path, source.extension, chunksize, sheet_hint)
+            return
+        spool = _spool_input_stream(source, prefix)
+
+    with spool:
+        yield from _iter_spreadsheet_file_chunks(spool, source.extension, chunksize, sheet_hint)
+
+
+def prefetch_inputs(args: Arguments, manifest: ToolManifest, prefix="/tmp", max_workers=None) -> dict:
+    """
+    Starts downloading the files for all of the manifest's input slots given in the arguments at
+    the same time, and returns immediately. Each result is the path of the downloaded file, whose
+    extension reflects the detected type of its content. file:// inputs are not copied, so their
+    result is the original path. Use concurrent.futures.as_completed to start work on whichever
+    input arrives first.
+
+    :param args: The tool's arguments, which give the URL for each input slot by name
+    :param manifest: The tool's manifest, which declares the input slots
+    :param prefix: A directory into which to place the downloaded files
+    :param max_workers: The maximum number of files to download at once. Defaults to the number
+                        of workers in the resource profile.
+    :return: A dict from input slot name to a Future of the downloaded file's path
+    """
+    urls = {slot.name: args.get(slot.name) for slot in manifest.inputs if args.get(slot.name) is not None}
+
+    executor = ThreadPoolExecutor(max_workers=max_workers or max(1, min(len(urls), get_resource_profile().workers)))
+
+    # Slots with the same URL would download to the same file, so download each URL only once.
+    downloads = {}
+    for url in urls.values():
+        if url not in downloads:
+            downloads[url] = executor.submit(lambda url: _download_input_file(url, prefix)[0], url)
+    executor.shutdown(wait=False)
+
+    return {name: downloads[url] for name, url in urls.items()}
+
+
+def _tell(f) -> Optional[int]:
+    """
+    Returns the position of the given stream, or None if it has none, e.g., a pipe.
+    """
+    try:
+        return f.tell()
+    except (AttributeError, OSError, UnsupportedOperation):
+        return None
+
+
+def read_input_file(url, data: BinaryIO, cache=None):
     """
     Download input data from the given URL to the given file-like object
 
     :param url: The source from which to download the data
     :param data: The destination to which to write the data
+    :param cache: An optional InputCache through which to download http:// and https:// URLs
+    """
+    with tracing.span("download", url=url) as span:
+        start = _tell(data)
+        if cache is not None and (url.startswith("http://") or url.startswith("https://")):
+            with cache.fetch(url) as entry:
+                with open(entry.path, "rb") as f:
+                    _copy_stream(f, data)
+        elif url.startswith("file://"):
+            filepath = url[7:]
+            with open(filepath, "rb") as f:
+                _copy_stream(f, data)
+        elif url.startswith("http://") or url.startswith("https://"):
+            with _open_input_stream(url, decompress=False) as source:
+                span.set("format", source.extension)
+                _copy_input_stream(source, data)
+        else:
+            raise ValueError(f"unrecognized protocol: {url}")
+        end = _tell(data)
+        span.set("bytes", None if start is None or end is None else end - start)
+
+
+def _iter_stream_chunks(f: BinaryIO) -> Iterator[bytes]:
+    """
+    Yields the content of the given binary stream from its current position, in chunks sized by
+    the resource profile.
+    """
+    buffer_size = get_resource_profile().buffer_size
+    while chunk := f.read(buffer_size):
+        yield chunk
+
+
+def _write_output_chunks(url: str, chunks: Iterator[bytes], prefix="/tmp"):
+    """
+    Writes the given chunks of data to the given URL. file:// URLs are written as the chunks are
+    produced. Over http:// and https://, the chunks are first collected in a spool, in memory while
+    small and in a temporary file in prefix otherwise, since the shared session retries failed
+    uploads, and a body that cannot be rewound would be resent empty.
     """
     if url.startswith("file://"):
-        filepath = url[7:]
-        with open(filepath, "rb") as f:
-            while chunk := f.read(4096):
-                data.write(chunk)
+        with open(url[7:], "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
     elif url.startswith("http://") or url.startswith("https://"):
-        with requests.get(url, stream=True) as f:
-            for chunk in f.iter_content(4096):
-                data.write(chunk)
+        with _Spool(prefix) as spool:
+            for chunk in chunks:
+                spool.write(chunk)
+            with spool.open() as body:
+                http.put(url, data=body).raise_for_status()
     else:
         raise ValueError(f"unrecognized protocol: {url}")
 
 
-def write_output_file(url, data: BinaryIO):
+def _archive_entry_name(url: str) -> str:
+    """
+    Returns the name of the file inside a zip archive to be uploaded to the given URL, which is the
+    name of the archive without its .zip extension.
+    """
+    name = os.path.basename(url.split("?", 1)[0])
+    if name.lower().endswith(".zip"):
+        name = name[:-len(".zip")]
+    return name or "data"
+
+
+def _choose_output_compression(compression=None, slot: ToolManifestSlot = None) -> Optional[str]:
+    """
+    Returns the compression with which to write an output. This is the given compression, or else
+    the compression named by the first of the output slot's extensions, e.g., gzip for csv.gz, or
+    else None for no compression.
+    """
+    if compression is not None:
+        if compression not in COMPRESSION_EXTENSIONS:
+            raise ValueError("Unrecognized output compression", compression)
+        return compression
+    if slot is not None and slot.extensions:
+        return compression_for_extension(slot.extensions[0])
+    return None
+
+
+def write_output_file(url, data: BinaryIO, slot: ToolManifestSlot = None, compression=None, prefix="/tmp"):
     """
     Uploads output data from the given file-like object to the given URL
 
     :param url: The destination to which to upload data
     :param data: The source from which to read the data
+    :param slot: The output slot being written, if any
+    :param compression: The compression with which to compress the data as it is uploaded, i.e.,
+                        gzip, bz2, zstd, or zip. If not given, then the compression is chosen from
+                        the first of the output slot's extensions, e.g., csv.gz, and otherwise the
+                        data is uploaded as is.
+    :param prefix: A directory in which to place the temporary file that holds compressed or
+                   unseekable data for an http:// or https:// upload, if it is too large to keep
+                   in memory
     """
-    if url.startswith("file://"):
-        filepath = url[7:]
-        with open(filepath, "wb") as f:
-            while chunk := data.read(4096):
-                f.write(chunk)
-    elif url.startswith("http://") or url.startswith("https://"):
-        requests.put(url, data=data)
-    else:
-        raise ValueError(f"unrecognized protocol: {url}")
+    compression = _choose_output_compression(compression, slot)
+    with tracing.span("upload", url=url, compression=compression) as span:
+        if compression is not None:
+            chunks = compress(_iter_stream_chunks(data), compression, _archive_entry_name(url))
+            _write_output_chunks(url, _count_bytes(chunks, span), prefix)
+            return
+
+        start = _tell(data)
+        if url.startswith("file://"):
+            filepath = url[7:]
+            with open(filepath, "wb") as f:
+                _copy_stream(data, f)
+        elif url.startswith("http://") or url.startswith("https://"):
+            if start is None:
+                # A stream without a position, e.g., a pipe, cannot be rewound for a retry.
+                _write_output_chunks(url, _count_bytes(_iter_stream_chunks(data), span), prefix)
+                return
+            http.put(url, data=data).raise_for_status()
+        else:
+            raise ValueError(f"unrecognized protocol: {url}")
+        end = _tell(data)
+        span.set("bytes", None if start is None or end is None else end - start)
+
+
+OUTPUT_FORMATS = ["csv", "xlsx"]
+
+
+def _choose_output_format(format=None, slot: ToolManifestSlot = None) -> str:
+    """
+    Returns the format in which to write an output. This is the given format, or else the first
+    supported format among the output slot's extensions, ignoring any compression, or else CSV.
+    """
+    if format is not None:
+        if format not in OUTPUT_FORMATS:
+            raise ValueError("Unrecognized output format", format)
+        return format
+    if slot is not None:
+        for extension in slot.extensions:
+            extension = extension.lower()
+            if compression_for_extension(extension) is not None:
+                extension = extension.rpartition(".")[0]
+            if extension in OUTPUT_FORMATS:
+                return extension
+    return "csv"
+
+
+def _iter_csv_batches(df: DataFrame, batch_size: int, encoding: str) -> Iterator[bytes]:
+    """
+    Yields the given dataframe as encoded CSV data, batch_size rows at a time. The header is part
+    of the first batch.
+    """
+    yield df.iloc[0:batch_size].to_csv(index=False).encode(encoding)
+    for start in range(batch_size, len(df), batch_size):
+        yield df.iloc[start:start + batch_size].to_csv(index=False, header=False).encode(encoding)
+
+
+def _count_bytes(chunks: Iterator[bytes], span) -> Iterator[bytes]:
+    """
+    Yields the given chunks, and then records their total size in the given span.
+    """
+    total = 0
+    for chunk in chunks:
+        total = total + len(chunk)
+        yield chunk
+    span.set("bytes", total)
+
+
+def write_output_data_frame(url: str, df: DataFrame, format=None, slot: ToolManifestSlot = None,
+                            batch_size=100000, encoding="utf-8", prefix="/tmp", compression=None):
+    """
+    Uploads the given pandas dataframe to the given URL as a spreadsheet, without its index.
+
+    CSV data is encoded batch_size rows at a time, so only one batch is ever held in memory as
+    text. file:// URLs are written as the batches are encoded. Over http:// and https://, the
+    batches are spooled, in a temporary file in prefix once they outgrow the spool threshold, so
+    that the upload can be rewound and retried. XLSX data is written with openpyxl in write-only
+    mode to a temporary file, since an XLSX file cannot be streamed, and then uploaded.
+
+    :param url: The destination to which to upload the data
+    :param df: The dataframe to upload
+    :param format: The format of the spreadsheet, either csv or xlsx. If not given, then the
+                   format is chosen from the output slot's extensions.
+    :param slot: The output slot being written, if any
+    :param batch_size: The number of rows to encode at once when writing CSV
+    :param encoding: The character set to use when writing CSV
+    :param prefix: A directory in which to place temporary files
+    :param compression: The compression with which to compress the data as it is uploaded, as in
+                        write_output_file
+    """
+    import openpyxl
+    from pandas import isna
+
+    format = _choose_output_format(format, slot)
+    compression = _choose_output_compression(compression, slot)
+
+    if format == "csv":
+        with tracing.span("upload", url=url, format="csv", rows=df.shape[0], compression=compression) as span:
+            batches = _iter_csv_batches(df, batch_size, encoding)
+            if compression is not None:
+                batches = compress(batches, compression, _archive_entry_name(url))
+            _write_output_chunks(url, _count_bytes(batches, span), prefix)
+    elif format == "xlsx":
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet()
+        ws.append(list(df.columns))
+        for row in df.itertuples(index=False, name=None):
+            ws.append([None if isna(value) else value for value in row])
+        with TemporaryFile(dir=prefix) as f:
+            wb.save(f)
+            f.seek(0, SEEK_SET)
+            write_output_file(url, f, compression=compression, prefix=prefix)
+
@@ -1,9 +1,41 @@
+import os
+import threading
+from datetime import datetime
+from hashlib import sha256
 from os import path
+from stat import S_ISREG
 
-from yaml import safe_load
+
+def _load_yaml(s: str):
+    """
+    Parses the given string as yaml data, using the much faster libyaml parser if it is available.
+    """
+    import yaml
+
+    return yaml.load(s, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+
+
+def _parse_boolean(value: str) -> bool:
+    return value.lower().startswith("t")
+
+
+def _parse_string(value: str) -> str:
+    return value
+
+
+# The function that converts a command line value to each type of parameter
+PARAMETER_CONVERTERS = {
+    "int": int,
+    "float": float,
+    "boolean": _parse_boolean,
+    "string": _parse_string,
+    "date": datetime.fromisoformat,
+}
 
 
 class ManifestEnvironmentSecret:
+    __slots__ = ("name", "description", "required", "example")
+
     @staticmethod
     def from_yaml(o):
         return ManifestEnvironmentSecret(o.get("name"), o.get("description"), o.get("required"), o.get("example"))
@@ -28,6 +60,8 @@ class ManifestEnvironmentSecret:
 
 
 class ManifestEnvironmentVariable:
+    __slots__ = ("name", "description", "required", "default")
+
     @staticmethod
     def from_yaml(o):
         return ManifestEnvironmentVariable(o.get("name"), o.get("description"), o.get("required"), o.get("default"))
@@ -52,6 +86,8 @@ class ManifestEnvironmentVariable:
 
 
 class ManifestEnvironment:
+    __slots__ = ("size", "secrets", "variables")
+
     @staticmethod
     def from_yaml(o):
         return ManifestEnvironment(o.get("size"),
@@ -76,17 +112,77 @@ class ManifestEnvironment:
         return f"ManifestEnvironment({self.size}, {self.secrets}, {self.variables})"
 
 
+_discovered = {}
+
+_discovered_lock = threading.Lock()
+
+
+def _load_manifest_file(filename: str, stat: os.stat_result, cache_directory: str = None):
+    """
+    Loads the manifest in the given file, going through the given on-disk cache if there is one.
+    Cached manifests are only used if the file's modification time and size are unchanged.
+    """
+    import pickle
+
+    version = (stat.st_mtime_ns, stat.st_size)
+
+    cache_path = None
+    if cache_directory is not None:
+        cache_path = path.join(cache_directory, sha256(path.abspath(filename).encode("utf-8")).hexdigest() + ".pickle")
+        try:
+            with open(cache_path, "rb") as f:
+                cached_version, manifest = pickle.load(f)
+            if cached_version == version:
+                return manifest
+        except Exception:
+            # Missing, partly written, or from an incompatible version. Just load the file again.
+            pass
+
+    with open(filename, "r") as f:
+        manifest = Manifest.loads(f.read())
+
+    if cache_path is not None:
+        os.makedirs(cache_directory, exist_ok=True)
+        temp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}"
+        with open(temp_path, "wb") as f:
+            pickle.dump((version, manifest), f)
+        os.replace(temp_path, cache_path)
+
+    return manifest
+
+
 class Manifest:
+    __slots__ = ("toolforge", "type", "container", "environment")
+
     @staticmethod
-    def discover():
+    def discover(cache_directory: str = None):
         """
-        Find and load manifest from well-known locations
+        Find and load manifest from well-known locations. Loaded manifests are cached for the life
+        of the process, and reloaded only if the file changes.
+        :param cache_directory: An optional directory in which to also cache the loaded manifest on
+                                disk for later processes. Only use a directory that other users
+                                cannot write, since the cache is unpickled.
         :return: The discovered Manifest
         """
         for filename in ["/toolforge/manifest.yml", "manifest.yml"]:
-            if path.isfile(filename):
-                with open(filename, "r") as f:
-                    return Manifest.loads(f.read())
+            try:
+                stat = os.stat(filename)
+            except OSError:
+                continue
+            if not S_ISREG(stat.st_mode):
+                continue
+
+            key = path.abspath(filename)
+            version = (stat.st_mtime_ns, stat.st_size)
+            with _discovered_lock:
+                discovered = _discovered.get(key)
+            if discovered is not None and discovered[0] == version:
+                return discovered[1]
+
+            manifest = _load_manifest_file(filename, stat, cache_directory)
+            with _discovered_lock:
+                _discovered[key] = (version, manifest)
+            return manifest
         raise FileNotFoundError()
 
     @staticmethod
@@ -108,7 +204,7 @@ class Manifest:
         :param s:
         :return:
         """
-        return Manifest.from_yaml(safe_load(s))
+        return Manifest.from_yaml(_load_yaml(s))
 
     def __init__(self, toolforge: str, type: str, container: str, environment: ManifestEnvironment):
         self.toolforge = toolforge
@@ -130,6 +226,8 @@ class Manifest:
 
 
 class ToolManifestParameter:
+    __slots__ = ("type", "name", "description", "required")
+
     @staticmethod
     def from_yaml(o):
         return ToolManifestParameter(o.get("type"), o.get("name"), o.get("description"), o.get("required"))
@@ -154,28 +252,34 @@ class ToolManifestParameter:
 
 
 class ToolManifestSlot:
+    __slots__ = ("name", "description", "extensions", "columns")
+
     @staticmethod
     def from_yaml(o):
-        return ToolManifestSlot(o.get("name"), o.get("description"), o.get("extensions", []))
+        return ToolManifestSlot(o.get("name"), o.get("description"), o.get("extensions", []), o.get("columns"))
 
-    def __init__(self, name: str, description: str, extensions: list[str]):
+    def __init__(self, name: str, description: str, extensions: list[str], columns: list[str] = None):
         self.name = name
         self.description = description
         self.extensions = extensions
+        self.columns = columns
 
     def __eq__(self, other):
         return (self.name == other.name
                 and self.description == other.description
-                and self.extensions == other.extensions)
+                and self.extensions == other.extensions
+                and self.columns == other.columns)
 
     def __repr__(self):
         return str(self)
 
     def __str__(self):
-        return f"ToolManifestSlot({self.name}, {self.description}, {self.extensions})"
+        return f"ToolManifestSlot({self.name}, {self.description}, {self.extensions}, {self.columns})"
 
 
 class ToolManifest(Manifest):
+    __slots__ = ("parameters", "inputs", "outputs", "_converters")
+
     @staticmethod
     def from_yaml(o):
         if o.get("type") != "tool":
@@ -193,6 +297,21 @@ class ToolManifest(Manifest):
         self.parameters = parameters
         self.inputs = inputs
         self.outputs = outputs
+        self._converters = None
+
+    def converters(self) -> dict:
+        """
+        Returns a table from each parameter's name to a tuple of the function that converts its
+        command line value and whether it is required. The table is built once and reused.
+        """
+        if self._converters is None:
+            converters = {}
+            for parameter in self.parameters:
+                if parameter.type not in PARAMETER_CONVERTERS:
+                    raise ValueError(f"unrecognized parameter type {parameter.type}")
+                converters[parameter.name] = (PARAMETER_CONVERTERS[parameter.type], bool(parameter.required))
+            self._converters = converters
+        return self._converters
 
     def __eq__(self, other):
         return (super().__eq__(other)
@@ -0,0 +1,121 @@
+import threading
+
+from .manifest import Manifest
+
+
+class ResourceProfile:
+    """
+    The resources available to a tool, which the I/O functions use to choose their strategy.
+    """
+
+    def __init__(self, name: str, memory_bytes: int, workers: int, buffer_size: int, chunksize: int,
+                 spool_threshold: int, mmap_threshold: int):
+        """
+        :param name: The environment size this profile describes, e.g., medium
+        :param memory_bytes: The memory available to the tool
+        :param workers: The number of threads to use for concurrent downloads
+        :param buffer_size: The size of the buffers used to copy data
+        :param chunksize: The default number of rows per chunk when iterating over spreadsheets
+        :param spool_threshold: The largest input to keep in memory instead of on disk
+        :param mmap_threshold: The smallest local CSV file to parse through a memory map
+        """
+        self.name = name
+        self.memory_bytes = memory_bytes
+        self.workers = workers
+        self.buffer_size = buffer_size
+        self.chunksize = chunksize
+        self.spool_threshold = spool_threshold
+        self.mmap_threshold = mmap_threshold
+
+    def fits_in_memory(self, size: int, expansion: int = 5) -> bool:
+        """
+        Returns True if a spreadsheet of the given size in bytes can likely be loaded into a
+        dataframe in full. Parsed text takes several times as much memory as the raw file.
+        """
+        return size * expansion <= self.memory_bytes
+
+    def __eq__(self, other):
+        return (self.name == other.name
+                and self.memory_bytes == other.memory_bytes
+                and self.workers == other.workers
+                and self.buffer_size == other.buffer_size
+                and self.chunksize == other.chunksize
+                and self.spool_threshold == other.spool_threshold
+                and self.mmap_threshold == other.mmap_threshold)
+
+    def __repr__(self):
+        return str(self)
+
+    def __str__(self):
+        return (f"ResourceProfile({self.name}, {self.memory_bytes}, {self.workers}, {self.buffer_size}, "
+                f"{self.chunksize}, {self.spool_threshold}, {self.mmap_threshold})")
+
+
+MB = 1024 * 1024
+
+GB = 1024 * MB
+
+# The profile for each environment size that a manifest may declare.
+PROFILES = {
+    "small": ResourceProfile("small", 2 * GB, 2, 256 * 1024, 25000, 8 * MB, 64 * MB),
+    "medium": ResourceProfile("medium", 4 * GB, 4, 1 * MB, 100000, 32 * MB, 128 * MB),
+    "large": ResourceProfile("large", 8 * GB, 8, 1 * MB, 250000, 64 * MB, 256 * MB),
+    "xlarge": ResourceProfile("xlarge", 16 * GB, 16, 4 * MB, 500000, 128 * MB, 512 * MB),
+}
+
+DEFAULT_SIZE = "medium"
+
+_profile = None
+
+_profile_lock = threading.Lock()
+
+
+def resource_profile_for_size(size: str) -> ResourceProfile:
+    """
+    Returns the profile for the given environment size, or the default profile if the size is
+    missing or unrecognized.
+    """
+    if size in PROFILES:
+        return PROFILES[size]
+    if size is not None:
+        print(f"Unrecognized environment size {size}, using {DEFAULT_SIZE}...")
+    return PROFILES[DEFAULT_SIZE]
+
+
+def _discover_resource_profile() -> ResourceProfile:
+    try:
+        manifest = Manifest.discover()
+    except FileNotFoundError:
+        return resource_profile_for_size(None)
+    except Exception as e:
+        # yaml is only imported once a manifest is found, so its errors can only be named here.
+        import yaml
+
+        if not isinstance(e, (OSError, ValueError, TypeError, AttributeError, yaml.YAMLError)):
+            raise
+        print(f"Could not load manifest ({e}), using {DEFAULT_SIZE}...")
+        return resource_profile_for_size(None)
+    return resource_profile_for_size(manifest.environment.size if manifest.environment is not None else None)
+
+
+def get_resource_profile() -> ResourceProfile:
+    """
+    Returns the profile used by all I/O functions. By default, this is the profile for the
+    environment size declared by the discovered manifest.
+    """
+    global _profile
+    if _profile is None:
+        with _profile_lock:
+            if _profile is None:
+                _profile = _discover_resource_profile()
+    return _profile
+
+
+def set_resource_profile(profile: ResourceProfile):
+    """
+    Replaces the profile used by all I/O functions, e.g., to tune them by hand. Passing None
+    rediscovers the profile from the manifest on next use.
+    """
+    global _profile
+    with _profile_lock:
+        _profile = profile
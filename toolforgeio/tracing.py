@@ -0,0 +1,145 @@
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, Optional
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    # Not POSIX, so no peak memory.
+    resource = None
+
+_listeners = []
+
+_listeners_lock = threading.Lock()
+
+_current_span = ContextVar("toolforgeio_span", default=None)
+
+
+class Span:
+    """
+    A timed phase of an I/O operation, e.g., a download or a parse, with attributes describing it.
+
+    Spans report these attributes where they apply: url, with any query string removed; bytes, the
+    number of bytes transferred or examined; throughput, in bytes per second; format, the detected
+    file extension; compression; encoding, the detected character set; engine; cache_hit; rows and
+    columns; and peak_rss, the peak resident memory of the process in bytes when the span ended.
+    """
+
+    __slots__ = ("name", "attributes", "parent", "start", "end")
+
+    def __init__(self, name: str, attributes: dict, parent=None):
+        self.name = name
+        self.attributes = attributes
+        self.parent = parent
+        self.start = time.perf_counter()
+        self.end = None
+
+    @property
+    def duration(self) -> Optional[float]:
+        """
+        The span's duration in seconds, or None if it has not ended.
+        """
+        return None if self.end is None else self.end - self.start
+
+    def set(self, key: str, value):
+        """
+        Sets an attribute of the span.
+        """
+        self.attributes[key] = value
+
+    def __repr__(self):
+        return str(self)
+
+    def __str__(self):
+        return f"Span({self.name}, {self.attributes}, {self.duration})"
+
+
+class _NoopSpan:
+    """
+    The span given out when there are no listeners, which ignores everything.
+    """
+
+    __slots__ = ()
+
+    def set(self, key: str, value):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def add_listener(listener: Callable[[Span], None]):
+    """
+    Registers a function to call with each span when it ends, e.g., to forward it to a metrics or
+    tracing system. Listeners are called on the thread that ran the span, and must not raise.
+    """
+    global _listeners
+    with _listeners_lock:
+        _listeners = _listeners + [listener]
+
+
+def remove_listener(listener: Callable[[Span], None]):
+    """
+    Unregisters a function added with add_listener.
+    """
+    global _listeners
+    with _listeners_lock:
+        _listeners = [existing for existing in _listeners if existing != listener]
+
+
+def enabled() -> bool:
+    """
+    Returns True if any listener is registered, i.e., if spans are being recorded.
+    """
+    return bool(_listeners)
+
+
+def _peak_rss() -> Optional[int]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, and everything else reports kilobytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _strip_url(url: str) -> str:
+    # Presigned URLs carry credentials in their query strings.
+    return url.split("?", 1)[0]
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Span]:
+    """
+    Times the enclosed block as a span with the given name and attributes, and passes it to every
+    listener when the block exits. If there are no listeners, then this does nothing, and the
+    block gets a span that ignores attributes.
+
+    :param name: The name of the phase, e.g., download, decode, parse, or upload
+    :param attributes: The span's initial attributes
+    :return: The span, to which the block may add attributes
+    """
+    listeners = _listeners
+    if not listeners:
+        yield _NOOP_SPAN
+        return
+
+    if "url" in attributes:
+        attributes["url"] = _strip_url(attributes["url"])
+    current = Span(name, attributes, _current_span.get())
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.set("error", f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        current.end = time.perf_counter()
+        _current_span.reset(token)
+        if current.attributes.get("bytes") is not None and current.duration > 0:
+            current.set("throughput", current.attributes["bytes"] / current.duration)
+        current.set("peak_rss", _peak_rss())
+        for listener in listeners:
+            listener(current)
@@ -0,0 +1,214 @@
+import importlib
+import importlib.util
+import json
+import os
+import sys
+import time
+import traceback
+from contextlib import redirect_stdout
+from typing import Callable, Iterator, TextIO
+
+from .arguments import Arguments
+from .manifest import Manifest
+
+# The modules that a warm worker imports once up front, so that no job pays to import them.
+WARM_MODULES = ["pandas", "openpyxl", "xlrd", "chardet", "requests", "toolforgeio.io"]
+
+
+def _warm():
+    """
+    Imports the heavy modules that tools use, and opens the shared HTTP session.
+    """
+    for module in WARM_MODULES:
+        if importlib.util.find_spec(module) is not None:
+            importlib.import_module(module)
+
+    from . import http
+
+    http.get_session()
+
+
+def _parse_job(data, default_id) -> tuple:
+    """
+    Returns the id and argument vector of the given job, which is either an argument vector or an
+    object with an argv and an optional id.
+    """
+    if isinstance(data, list):
+        return default_id, data
+    if isinstance(data, dict) and isinstance(data.get("argv"), list):
+        return data.get("id", default_id), data["argv"]
+    raise ValueError("unrecognized job, expected an argument vector or an object with an argv")
+
+
+def run_job(tool: Callable[[Arguments], object], manifest: Manifest, argv: list, job_id=None) -> dict:
+    """
+    Runs the tool once with the given argument vector, as if it were started from the command line.
+    Anything the tool prints goes to stderr, so that stdout is left for reports. Errors are caught
+    and reported, so a failing job does not affect later ones.
+
+    :param tool: The tool's entry point, which takes the specialized Arguments
+    :param manifest: The tool's manifest
+    :param argv: The job's argument vector, including the program name, as in sys.argv
+    :param job_id: An identifier to include in the report
+    :return: A report of the job's id, status, error if any, and timings in seconds
+    """
+    report = {"id": job_id, "status": "ok", "error": None, "timings": {}}
+    cwd = os.getcwd()
+    start = time.perf_counter()
+    try:
+        args = Arguments.parse_from_argv(argv).specialize(manifest)
+        specialized = time.perf_counter()
+        report["timings"]["specialize"] = specialized - start
+        try:
+            with redirect_stdout(sys.stderr):
+                tool(args)
+        finally:
+            report["timings"]["run"] = time.perf_counter() - specialized
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            report["status"] = "error"
+            report["error"] = f"exited with status {e.code}"
+    except Exception as e:
+        report["status"] = "error"
+        report["error"] = f"{type(e).__name__}: {e}"
+        traceback.print_exc(file=sys.stderr)
+    finally:
+        os.chdir(cwd)
+        report["timings"]["total"] = time.perf_counter() - start
+    return report
+
+
+def _iter_stream_jobs(f: TextIO) -> Iterator[tuple]:
+    for index, line in enumerate(f):
+        if not line.strip():
+            continue
+        try:
+            yield _parse_job(json.loads(line), index)
+        except ValueError as e:
+            yield index, e
+
+
+def _claim_spool_job(spool_directory: str, name: str):
+    """
+    Claims the given job file by renaming it, so that each job runs once even if many workers share
+    the spool directory.
+
+    :return: The path of the claimed job file, or None if another worker claimed it first
+    """
+    claimed_path = os.path.join(spool_directory, name[:-len(".json")] + ".running")
+    try:
+        os.rename(os.path.join(spool_directory, name), claimed_path)
+    except FileNotFoundError:
+        return None
+    return claimed_path
+
+
+def _iter_spool_jobs(spool_directory: str, poll_interval=None) -> Iterator[tuple]:
+    """
+    Yields the jobs in the given spool directory in order of name, along with the path of each
+    claimed job file. If poll_interval is None, then stops when the directory is empty, and
+    otherwise waits that many seconds for more jobs.
+    """
+    while True:
+        names = sorted(name for name in os.listdir(spool_directory)
+                       if name.endswith(".json") and not name.endswith(".result.json"))
+        for name in names:
+            claimed_path = _claim_spool_job(spool_directory, name)
+            if claimed_path is None:
+                continue
+            job_id = name[:-len(".json")]
+            try:
+                with open(claimed_path, "r") as f:
+                    job = _parse_job(json.load(f), job_id)
+            except ValueError as e:
+                job = (job_id, e)
+            yield job + (claimed_path,)
+        if not names:
+            if poll_interval is None:
+                return
+            time.sleep(poll_interval)
+
+
+def _write_report(report: dict, output: TextIO):
+    output.write(json.dumps(report) + "\n")
+    output.flush()
+
+
+def _run(tool, manifest, job_id, argv) -> dict:
+    if isinstance(argv, Exception):
+        return {"id": job_id, "status": "error", "error": f"{type(argv).__name__}: {argv}", "timings": {}}
+    return run_job(tool, manifest, argv, job_id)
+
+
+def run_worker(tool: Callable[[Arguments], object], jobs: TextIO = None, spool_directory: str = None,
+               manifest: Manifest = None, output: TextIO = None, warm=True, poll_interval=None) -> int:
+    """
+    Runs the tool once for each of many jobs in this one process, paying to start Python, import
+    pandas, and load the manifest only once. Jobs are read either as lines of JSON from the given
+    stream, or as JSON files from the given spool directory. Each job is an argument vector as in
+    sys.argv, or an object with an argv and an optional id.
+
+    A report of each job's status and timings is written to the output as a line of JSON. Jobs from
+    a spool directory also get their report written next to them as <job>.result.json.
+
+    :param tool: The tool's entry point, which takes the specialized Arguments
+    :param jobs: The stream from which to read jobs, one per line. Defaults to stdin.
+    :param spool_directory: A directory from which to read jobs instead, one per .json file
+    :param manifest: The tool's manifest. Discovered by default.
+    :param output: The stream to which to write reports. Defaults to stdout.
+    :param warm: If True, then import the heavy modules before running the first job
+    :param poll_interval: For a spool directory, the seconds to wait for more jobs when it is
+                          empty, or None to stop instead
+    :return: The number of jobs that failed
+    """
+    manifest = manifest or Manifest.discover()
+    output = output or sys.stdout
+    if warm:
+        _warm()
+
+    failures = 0
+    if spool_directory is not None:
+        for job_id, argv, claimed_path in _iter_spool_jobs(spool_directory, poll_interval):
+            report = _run(tool, manifest, job_id, argv)
+            # The report is named for the job file, not the job's id, which may be anything.
+            result_path = claimed_path[:-len(".running")] + ".result.json"
+            with open(result_path, "w") as f:
+                json.dump(report, f)
+            os.remove(claimed_path)
+            failures = failures + (report["status"] != "ok")
+            _write_report(report, output)
+    else:
+        for job_id, argv in _iter_stream_jobs(jobs or sys.stdin):
+            report = _run(tool, manifest, job_id, argv)
+            failures = failures + (report["status"] != "ok")
+            _write_report(report, output)
+    return failures
+
+
+def _load_tool(name: str) -> Callable[[Arguments], object]:
+    """
+    Returns the tool entry point with the given name, as module:function.
+    """
+    module_name, _, function_name = name.partition(":")
+    if not function_name:
+        raise ValueError(f"unrecognized tool {name}, expected module:function")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python3 -m toolforgeio.worker",
+                                     description="Runs many tool jobs in one warm process.")
+    parser.add_argument("tool", help="The tool's entry point, as module:function")
+    parser.add_argument("--spool", help="Read jobs from this directory instead of stdin")
+    parser.add_argument("--poll", type=float, help="Wait this many seconds for more jobs in the spool directory")
+    options = parser.parse_args(argv)
+
+    sys.path.insert(0, os.getcwd())
+    failures = run_worker(_load_tool(options.tool), spool_directory=options.spool, poll_interval=options.poll)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())